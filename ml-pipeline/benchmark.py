@@ -0,0 +1,244 @@
+"""
+Benchmarks - Reproducible timings for the serving and training hot paths
+Writes machine-readable JSON and compares it against a saved baseline.
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --compare baseline.json      # exits 1 on regression
+
+Each benchmark is repeated; its summary value and the spread of the runs are
+saved, and a change only counts as a regression beyond both --threshold and
+that spread.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def result(name, runs, unit, better='lower', statistic=np.median):
+    """One benchmark: statistic (median, or min for best-of) of its runs plus their relative spread"""
+    runs = np.asarray(runs, dtype=np.float64)
+    value = float(statistic(runs))
+    noise = float(runs.max() - runs.min()) / value if value else 0.0
+    return {'name': name, 'value': value, 'unit': unit, 'better': better, 'runs': runs.tolist(), 'noise': noise}
+
+def latency_results(prefix, runs):
+    """Median throughput, p50 and p99 over runs of (latencies in seconds, wall seconds)"""
+    runs = [(np.asarray(latencies) * 1000, wall) for latencies, wall in runs]
+    return [
+        result(f'{prefix}.throughput', [len(latencies) / wall for latencies, wall in runs], 'req/s', better='higher'),
+        result(f'{prefix}.p50', [np.percentile(latencies, 50) for latencies, _ in runs], 'ms'),
+        result(f'{prefix}.p99', [np.percentile(latencies, 99) for latencies, _ in runs], 'ms'),
+    ]
+
+def sample_snapshots(count, seed=0):
+    """Realistic request payloads drawn from the training generators"""
+    from train_model import FEATURE_COLUMNS, SCENARIOS, generate_training_data
+    # Every scenario's row count is floored: ask for one spare row per scenario
+    base_samples = sum(base for _, _, base in SCENARIOS)
+    scale = max((count + len(SCENARIOS)) / base_samples, 0.01)
+    X, _ = generate_training_data(scale=scale, rng=np.random.default_rng(seed))
+    X = X[np.random.default_rng(seed).permutation(len(X))[:count]]
+    return [dict(zip(FEATURE_COLUMNS, map(float, row))) for row in X]
+
+
+def make_sender(url=None):
+    """POST json to the in-process Flask app, or to a running server when url is given"""
+    if url:
+        import urllib.request
+
+        def send(path, payload):
+            request = urllib.request.Request(url.rstrip('/') + path, json.dumps(payload).encode(),
+                                             {'Content-Type': 'application/json'})
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        return send
+
+    import model_server
+    local = threading.local()
+
+    def send(path, payload):
+        # Flask test clients are not shared between threads
+        if not hasattr(local, 'client'):
+            local.client = model_server.app.test_client()
+        return local.client.post(path, json=payload).status_code
+    return send
+
+def bench_serving(concurrency_levels, requests_per_level, batch_size, url=None, repeats=5):
+    send = make_sender(url)
+    snapshots = sample_snapshots(max(requests_per_level, batch_size))
+    results = []
+
+    # Warm up caches, allocator and the model
+    for snapshot in snapshots[:50]:
+        send('/predict', snapshot)
+
+    for concurrency in concurrency_levels:
+        def timed(snapshot):
+            started = time.perf_counter()
+            status = send('/predict', snapshot)
+            if status != 200:
+                raise RuntimeError(f"/predict returned {status}")
+            return time.perf_counter() - started
+
+        runs = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                latencies = list(pool.map(timed, snapshots[:requests_per_level]))
+            runs.append((latencies, time.perf_counter() - started))
+        results += latency_results(f'serving.predict.c{concurrency}', runs)
+
+    batch = {'snapshots': snapshots[:batch_size]}
+    throughputs, medians = [], []
+    for _ in range(repeats):
+        latencies = []
+        started = time.perf_counter()
+        for _ in range(max(requests_per_level // batch_size, 20)):
+            request_started = time.perf_counter()
+            send('/predict/batch', batch)
+            latencies.append(time.perf_counter() - request_started)
+        throughputs.append(len(latencies) * batch_size / (time.perf_counter() - started))
+        medians.append(np.percentile(latencies, 50) * 1000)
+    results.append(result(f'serving.batch{batch_size}.rows_per_second', throughputs, 'rows/s', better='higher'))
+    results.append(result(f'serving.batch{batch_size}.p50', medians, 'ms'))
+    return results
+
+
+def bench_generators(num_samples, repeats=5):
+    import train_model
+    results = []
+    for generator in (train_model.generate_normal_operations, train_model.generate_degraded_scenarios,
+                      train_model.generate_cascade_failures, train_model.generate_near_failure_scenarios):
+        timings = []
+        for repeat in range(repeats):
+            started = time.perf_counter()
+            generator(num_samples, np.random.default_rng(repeat))
+            timings.append(time.perf_counter() - started)
+        # Best of the runs: slower ones measure the machine, not the generator
+        results.append(result(f'generate.{generator.__name__}.seconds', timings, 's', statistic=np.min))
+    return results
+
+
+def bench_training(scale):
+    """End-to-end train_model.main in a child process, writing into a scratch models/ dir"""
+    scratch = tempfile.mkdtemp(prefix='sre-bench-')
+    try:
+        workdir = os.path.join(scratch, 'ml-pipeline')
+        os.makedirs(workdir)
+        os.makedirs(os.path.join(scratch, 'models'))
+        env = dict(os.environ, PYTHONPATH=HERE + os.pathsep + os.environ.get('PYTHONPATH', ''))
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', f'import train_model; train_model.main(scale={scale!r})'],
+                       cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+        wall = time.perf_counter() - started
+        # ru_maxrss is in KiB on Linux; the only child so far is the training run
+        peak_mb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    # One run: too slow to repeat, so only --threshold guards it
+    return [result('train.main.seconds', [wall], 's'), result('train.main.peak_rss', [peak_mb], 'MiB')]
+
+
+def environment():
+    versions = {'python': platform.python_version(), 'numpy': np.__version__}
+    for module in ('xgboost', 'flask'):
+        try:
+            versions[module] = __import__(module).__version__
+        except ImportError:
+            versions[module] = None
+    return {'platform': platform.platform(), 'cpus': os.cpu_count(), 'versions': versions}
+
+def compare(results, baseline, threshold):
+    """Print a comparison table; returns the names that regressed beyond their margin
+
+    A metric's margin is the larger of threshold and the run-to-run spread
+    seen for it in either the baseline or the current results.
+    """
+    previous = {entry['name']: entry for entry in baseline['results']}
+    regressions = []
+    print(f"\n{'benchmark':48s} {'baseline':>12s} {'current':>12s} {'change':>9s} {'margin':>8s}")
+    for entry in results:
+        before = previous.get(entry['name'])
+        if not before or before['value'] == 0:
+            print(f"{entry['name']:48s} {'-':>12s} {entry['value']:12.3f}")
+            continue
+        change = (entry['value'] - before['value']) / before['value']
+        margin = max(threshold, before.get('noise', 0.0), entry.get('noise', 0.0))
+        worse = change > margin if entry['better'] == 'lower' else change < -margin
+        if worse:
+            regressions.append(entry['name'])
+        print(f"{entry['name']:48s} {before['value']:12.3f} {entry['value']:12.3f} {change:+8.1%} {margin:8.1%}"
+              + ("  REGRESSION" if worse else ""))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the model server and training pipeline")
+    parser.add_argument('--suites', default='serving,generators,training',
+                        help="Comma-separated suites to run (default: all)")
+    parser.add_argument('--concurrency', default='1,4,16', help="Concurrency levels for /predict")
+    parser.add_argument('--requests', type=int, default=500, help="Requests per concurrency level")
+    parser.add_argument('--batch-size', type=int, default=100, help="Snapshots per /predict/batch request")
+    parser.add_argument('--url', help="Benchmark a running server instead of the in-process app")
+    parser.add_argument('--generator-samples', type=int, default=1_000_000, help="Rows per generator call")
+    parser.add_argument('--repeats', type=int, default=5,
+                        help="Runs per serving and generator benchmark; the median (best for generators) is kept")
+    parser.add_argument('--train-scale', type=float, default=1.0, help="--scale for the end-to-end training run")
+    parser.add_argument('--output', help="Write results JSON to this file")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare against a saved results JSON")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Least relative slowdown that counts as a regression; a noisier metric "
+                             "needs more than its run-to-run spread (default: 0.10)")
+    args = parser.parse_args()
+
+    # Run from ml-pipeline/ so the server finds ../models and train_model imports resolve
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(HERE)
+    sys.path.insert(0, HERE)
+
+    suites = set(args.suites.split(','))
+    results = []
+    if 'serving' in suites:
+        print("Benchmarking serving...")
+        levels = [int(level) for level in args.concurrency.split(',')]
+        results += bench_serving(levels, args.requests, args.batch_size, args.url, args.repeats)
+    if 'generators' in suites:
+        print("Benchmarking data generators...")
+        results += bench_generators(args.generator_samples, args.repeats)
+    if 'training' in suites:
+        print("Benchmarking end-to-end training...")
+        results += bench_training(args.train_scale)
+
+    report = {'created_at': time.time(), 'environment': environment(), 'results': results}
+    for entry in results:
+        print(f"{entry['name']:48s} {entry['value']:12.3f} {entry['unit']:6s} (runs vary {entry['noise']:.1%})")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {output}")
+
+    if baseline_path:
+        with open(baseline_path, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond their margin: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Drift Monitor - Constant-memory feature histograms of served traffic vs. training
+train_model.py saves per-feature reference histograms (quantile bins of
+held-out training rows) in the manifest. The server bins every scored row
+into the same edges, keeping a sliding window of fixed-size histograms, and
+reports the population stability index (PSI) of each feature on demand. An
+update is one vectorized comparison against the edges, so it stays on.
+"""
+import threading
+import numpy as np
+
+DEFAULT_BINS = 10
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, above that significant
+PSI_THRESHOLDS = (('significant', 0.25), ('moderate', 0.1))
+PSI_EPSILON = 1e-4
+
+def reference_histograms(X, feature_names, bins=DEFAULT_BINS):
+    """Quantile bin edges and bin proportions per feature, for the manifest"""
+    X = np.asarray(X, dtype=np.float64)
+    quantiles = np.linspace(0, 1, bins + 1)[1:-1]
+    reference = {}
+    for i, name in enumerate(feature_names):
+        column = X[:, i][~np.isnan(X[:, i])]
+        # Discrete features (flags, counts) collapse to fewer distinct edges
+        edges = np.unique(np.quantile(column, quantiles)) if len(column) else np.array([])
+        counts = np.bincount(np.searchsorted(edges, column, side='right'), minlength=len(edges) + 1)
+        reference[name] = {
+            'edges': edges.tolist(),
+            'proportions': (counts / max(len(column), 1)).tolist(),
+        }
+    return {'bins': bins, 'samples': len(X), 'features': reference}
+
+def population_stability_index(expected, actual, epsilon=PSI_EPSILON):
+    """PSI along the last axis of two proportion arrays; empty bins are floored at epsilon"""
+    expected = np.maximum(expected, epsilon)
+    actual = np.maximum(actual, epsilon)
+    return np.sum((actual - expected) * np.log(actual / expected), axis=-1)
+
+def drift_status(psi):
+    for status, threshold in PSI_THRESHOLDS:
+        if psi >= threshold:
+            return status
+    return 'stable'
+
+
+class DriftMonitor:
+    """Sliding-window histograms of the model's features against a reference
+
+    The window is `slots` histograms of up to window // slots rows each; when
+    the current one fills, the oldest is cleared and reused, so the window
+    covers the last window - window // slots to window rows.
+    """
+
+    def __init__(self, reference, feature_names, window=10000, slots=10, min_samples=100):
+        features = reference['features']
+        missing = [name for name in feature_names if name not in features]
+        if missing:
+            raise ValueError(f"The drift reference lacks features {missing[:3]}...")
+        self.feature_names = list(feature_names)
+        self.slot_size = max(1, window // slots)
+        self.min_samples = min_samples
+        num_bins = max(len(features[name]['edges']) for name in feature_names) + 1
+        self.num_bins = num_bins
+        # Edges padded with +inf: finite values never reach the padding bins.
+        # float32 like the model matrix, so binning never upcasts a batch
+        self._edges = np.full((len(feature_names), num_bins - 1), np.inf, dtype=np.float32)
+        self.expected = np.zeros((len(feature_names), num_bins))
+        for i, name in enumerate(feature_names):
+            edges, proportions = features[name]['edges'], features[name]['proportions']
+            self._edges[i, :len(edges)] = edges
+            self.expected[i, :len(proportions)] = proportions
+        self._offsets = np.arange(len(feature_names)) * num_bins
+        self._counts = np.zeros((slots, len(feature_names), num_bins), dtype=np.int64)
+        self._missing = np.zeros((slots, len(feature_names)), dtype=np.int64)
+        self._rows = np.zeros(slots, dtype=np.int64)
+        self._slot = 0
+        self._lock = threading.Lock()
+        self.total_rows = 0
+
+    def update(self, X):
+        """Add the rows of a (N, features) model matrix to the current window"""
+        X = np.asarray(X, dtype=np.float32)
+        if not len(X):
+            return
+        # searchsorted(side='right') for every feature at once
+        bins = (X[:, :, None] >= self._edges).sum(axis=2, dtype=np.intp)
+        bins += self._offsets
+        missing = np.isnan(X)
+        # NaN compares False everywhere: count it apart instead of in the first bin
+        bins = bins[~missing] if missing.any() else bins.ravel()
+        counts = np.bincount(bins, minlength=self._counts[0].size).reshape(self._counts[0].shape)
+        with self._lock:
+            if self._rows[self._slot] >= self.slot_size:
+                self._slot = (self._slot + 1) % len(self._rows)
+                self._counts[self._slot] = 0
+                self._missing[self._slot] = 0
+                self._rows[self._slot] = 0
+            self._counts[self._slot] += counts
+            self._missing[self._slot] += missing.sum(axis=0)
+            self._rows[self._slot] += len(X)
+            self.total_rows += len(X)
+
+    def state(self):
+        """The window's counts as JSON-serialisable lists, for report(peers=...) in another process"""
+        with self._lock:
+            return {
+                'counts': self._counts.sum(axis=0).tolist(),
+                'missing': self._missing.sum(axis=0).tolist(),
+                'rows': int(self._rows.sum()),
+                'total_rows': self.total_rows,
+            }
+
+    def report(self, peers=()):
+        """PSI, status and missing rate per feature over the current window
+
+        peers are state() of monitors of the same model in other workers;
+        their windows are added to this one.
+        """
+        with self._lock:
+            counts = self._counts.sum(axis=0)
+            missing = self._missing.sum(axis=0)
+            rows = int(self._rows.sum())
+            total_rows = self.total_rows
+        for state in peers:
+            counts = counts + np.asarray(state['counts'], dtype=np.int64)
+            missing = missing + np.asarray(state['missing'], dtype=np.int64)
+            rows += state['rows']
+            total_rows += state['total_rows']
+        observed = counts.sum(axis=1)
+        actual = counts / np.maximum(observed, 1)[:, None]
+        # Judged on non-missing values only: an absent feature is a missing rate, not drift
+        enough = observed >= self.min_samples
+        psi = np.where(enough, population_stability_index(self.expected, actual), 0.0)
+        features = {
+            name: {
+                'psi': float(psi[i]),
+                'status': drift_status(psi[i]) if enough[i] else 'insufficient_data',
+                'missing_rate': float(missing[i]) / rows if rows else 0.0,
+            }
+            for i, name in enumerate(self.feature_names)
+        }
+        drifted = sorted((name for name, stats in features.items() if stats['status'] in ('moderate', 'significant')),
+                         key=lambda name: -features[name]['psi'])
+        return {
+            'window_rows': rows,
+            'total_rows': total_rows,
+            'min_samples': self.min_samples,
+            'drifted': drifted,
+            'features': features,
+        }
@@ -0,0 +1,133 @@
+"""
+Explanations - Per-feature contributions behind each incident probability
+Contributions come from the booster's own tree-contribution computation
+(pred_contribs): one log-odds value per model feature plus a bias, summing
+to the model's margin. Features are attributed to a service and an incident
+type so /explain can point at a likely root cause instead of the fixed
+thresholds behind predicted_incident_type.
+"""
+import numpy as np
+from rolling_features import ROLLING_STATS
+
+# Per-service metrics: '<service>_<family>' attributes to <service>
+SERVICE_METRIC_FAMILIES = ('cpu', 'memory', 'latency', 'availability', 'error_rate', 'throughput')
+
+# (service or None for any, family, incident type); first match wins, families match name suffixes
+INCIDENT_TYPE_RULES = [
+    ('database', 'cpu', 'database_overload'),
+    ('database', 'memory', 'database_overload'),
+    (None, 'latency', 'high_latency'),
+    (None, 'slo_violation_count', 'slo_breach'),
+    (None, 'error_rate', 'error_spike'),
+    (None, 'availability', 'availability_drop'),
+    (None, 'cpu', 'resource_saturation'),
+    (None, 'memory', 'resource_saturation'),
+    (None, 'throughput', 'throughput_drop'),
+    (None, 'dependency_health_score', 'cascading_failure'),
+    (None, 'cascade_risk', 'cascading_failure'),
+]
+
+# 'shap': exact path-dependent TreeSHAP; 'saabas': xgboost's approx_contribs, far cheaper per row
+METHODS = ('shap', 'saabas')
+
+def feature_sources(feature_names, rolling=None):
+    """Input feature behind each model feature: itself, or the metric a rolling column is computed from"""
+    sources = {name: name for name in feature_names}
+    if rolling is not None:
+        for i, column in enumerate(rolling.columns):
+            sources[column] = rolling.metrics[i // len(ROLLING_STATS)]
+    return [sources[name] for name in feature_names]
+
+def attribute_features(feature_names, rolling=None):
+    """(service, incident type) per model feature; None where a feature has no service or type"""
+    sources = feature_sources(feature_names, rolling)
+    split = {}
+    for source in set(sources):
+        families = [family for family in SERVICE_METRIC_FAMILIES if source.endswith('_' + family)]
+        split[source] = (source[:-len(families[0]) - 1], families[0]) if families else (None, source)
+    # A service reports several metric families; 'critical_path_latency' alone is not one
+    prefixes = [prefix for prefix, _ in split.values() if prefix]
+    services = {prefix for prefix in prefixes if prefixes.count(prefix) > 1}
+
+    attributions = []
+    for source in sources:
+        prefix, family = split[source]
+        service = prefix if prefix in services else None
+        incident_type = next((incident_type for rule_service, rule_family, incident_type in INCIDENT_TYPE_RULES
+                              if (rule_service is None or rule_service == service)
+                              and (source == rule_family or source.endswith('_' + rule_family))), None)
+        attributions.append((service, incident_type))
+    return attributions
+
+
+class Explainer:
+    """Tree contributions of one booster, summarized per service and incident type"""
+
+    def __init__(self, booster, feature_names, rolling=None, method='shap'):
+        if method not in METHODS:
+            raise ValueError(f"Unknown explanation method {method!r}, expected one of {METHODS}")
+        self.booster = booster
+        self.feature_names = feature_names
+        self.method = method
+        attributions = attribute_features(feature_names, rolling)
+        self.services = sorted({service for service, _ in attributions if service})
+        self.incident_types = sorted({incident_type for _, incident_type in attributions if incident_type})
+        self.feature_services = [service for service, _ in attributions]
+        self.feature_incident_types = [incident_type for _, incident_type in attributions]
+        # One-hot (features, groups) maps: per-group sums are a single matmul per batch
+        self._service_map = self._group_matrix(self.feature_services, self.services)
+        self._incident_type_map = self._group_matrix(self.feature_incident_types, self.incident_types)
+
+    @staticmethod
+    def _group_matrix(labels, groups):
+        matrix = np.zeros((len(labels), len(groups)), dtype=np.float32)
+        for i, label in enumerate(labels):
+            if label:
+                matrix[i, groups.index(label)] = 1.0
+        return matrix
+
+    def contributions(self, X):
+        """(N, features + 1) log-odds contributions of model rows; the last column is the bias"""
+        import xgboost as xgb
+        data = xgb.DMatrix(np.asarray(X, dtype=np.float32), feature_names=self.booster.feature_names)
+        return self.booster.predict(data, pred_contribs=True, approx_contribs=self.method == 'saabas')
+
+    def explain(self, X, contributions, top_k=5):
+        """One explanation dict per row of the model matrix X and its contribution rows"""
+        contributions = np.asarray(contributions, dtype=np.float32)
+        features = contributions[:, :-1]
+        by_service = features @ self._service_map
+        by_incident_type = features @ self._incident_type_map
+        top_k = min(top_k, features.shape[1])
+        # Most positive first: what pushed each row towards an incident
+        top = np.argsort(-features, axis=1, kind='stable')[:, :top_k]
+
+        explanations = []
+        for i in range(len(features)):
+            row = features[i].tolist()
+            # Binary requests may carry NaN (missing); JSON has no NaN
+            values = [None if value != value else value for value in X[i].tolist()]
+            explanations.append({
+                'method': self.method,
+                'base_value': float(contributions[i, -1]),
+                'contributions': dict(zip(self.feature_names, row)),
+                'top_contributors': [{
+                    'feature': self.feature_names[j],
+                    'value': values[j],
+                    'contribution': row[j],
+                    'service': self.feature_services[j],
+                    'incident_type': self.feature_incident_types[j],
+                } for j in top[i].tolist()],
+                'services': dict(zip(self.services, by_service[i].tolist())),
+                'incident_types': dict(zip(self.incident_types, by_incident_type[i].tolist())),
+                'likely_service': self._leading(self.services, by_service[i]),
+                'likely_incident_type': self._leading(self.incident_types, by_incident_type[i]),
+            })
+        return explanations
+
+    @staticmethod
+    def _leading(groups, totals):
+        """Group with the largest positive total, None if nothing pushes towards an incident"""
+        if not groups or totals.max() <= 0:
+            return None
+        return groups[int(totals.argmax())]
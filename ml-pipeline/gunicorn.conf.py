@@ -0,0 +1,60 @@
+"""
+Gunicorn config - Preforked production serving for model_server
+The model is loaded once in the master (preload_app) and the forked
+workers share its memory copy-on-write.
+
+    gunicorn -c gunicorn.conf.py model_server:app
+"""
+import gc
+import glob
+import os
+import shutil
+import tempfile
+from model_registry import available_cores
+
+# One inference thread per worker; parallelism comes from the workers.
+# Set before the app is preloaded so reloaded models pick it up too.
+os.environ.setdefault('MODEL_INFERENCE_THREADS', '1')
+# Workers publish their counters here so /metrics, /drift and /cache cover
+# all of them, whichever worker a scrape lands on (see WorkerStats)
+_stats_dir_created = not os.environ.get('WORKER_STATS_DIR')
+if _stats_dir_created:
+    os.environ['WORKER_STATS_DIR'] = tempfile.mkdtemp(prefix='model-server-stats-')
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+workers = int(os.environ.get('MODEL_SERVER_WORKERS', 0)) or available_cores()
+# gthread, not sync: its main loop keeps heartbeating while a request
+# thread holds a long /predict/stream feed, so `timeout` no longer kills
+# the worker mid-feed. Each open feed occupies one thread.
+worker_class = 'gthread'
+threads = int(os.environ.get('MODEL_SERVER_THREADS', 4))
+preload_app = True
+timeout = 30
+accesslog = None
+
+def on_starting(server):
+    # Counters start from zero: drop what workers of a previous run left behind
+    for path in glob.glob(os.path.join(os.environ['WORKER_STATS_DIR'], '*.json')):
+        os.remove(path)
+
+def when_ready(server):
+    # Move everything loaded so far (model, feature names) out of the GC's
+    # reach so collections in the workers don't dirty the shared pages
+    gc.freeze()
+    server.log.info(f"Model loaded once in master, forking {workers} workers")
+
+def post_fork(server, worker):
+    # Threads don't survive fork: each worker watches the model files itself
+    import model_server
+    model_server.start_model_watcher()
+    model_server.start_worker_stats()
+
+def worker_exit(server, worker):
+    # Final counters of an exiting worker stay in the totals
+    import model_server
+    if model_server.worker_stats is not None:
+        model_server.worker_stats.publish()
+
+def on_exit(server):
+    if _stats_dir_created:
+        shutil.rmtree(os.environ['WORKER_STATS_DIR'], ignore_errors=True)
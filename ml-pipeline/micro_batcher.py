@@ -0,0 +1,121 @@
+"""
+Micro Batcher - Coalesces concurrent single-snapshot requests into one inference call
+An asyncio loop on a background thread collects requests for up to max_wait
+or max_batch_size rows, scores them with one vectorized call and resolves each
+caller's future. Request threads block on their future, so this works behind
+any threaded WSGI server.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+
+
+class QueueFull(Exception):
+    """Raised when the number of queued rows reaches max_queue_size"""
+
+
+class MicroBatcher:
+    """Asyncio micro-batching scheduler in front of a score_fn(loaded, X) -> probabilities"""
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0, max_queue_size=1024, metrics=None):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._loop = None
+        self._queue = None
+        self._pid = None
+
+    def submit(self, loaded, row):
+        """Queue one feature row; returns a Future resolving to its incident probability"""
+        self._ensure_started()
+        with self._lock:
+            if self._pending >= self.max_queue_size:
+                raise QueueFull(f"Micro-batch queue is full ({self.max_queue_size} pending)")
+            self._pending += 1
+        future = Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (loaded, row, future, time.perf_counter()))
+        return future
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _ensure_started(self):
+        # Started lazily so each forked gunicorn worker gets its own loop thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pending = 0
+            ready = threading.Event()
+            threading.Thread(target=self._run_loop, args=(ready,), name='micro-batcher', daemon=True).start()
+            ready.wait()
+            self._pid = os.getpid()
+
+    def _run_loop(self, ready):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        ready.set()
+        # One inference thread: the loop collects the next batch while it scores
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='micro-batch-inference')
+        self._loop.run_until_complete(self._collect(executor))
+
+    async def _collect(self, executor):
+        loop = asyncio.get_running_loop()
+        scoring = None
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Drain what is already queued before waiting on the window
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                remaining = deadline - loop.time()
+                if len(batch) >= self.max_batch_size or remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            # At most one batch in inference: until it finishes, this one keeps filling up
+            while scoring is not None and not scoring.done() and len(batch) < self.max_batch_size:
+                next_row = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({next_row, scoring}, return_when=asyncio.FIRST_COMPLETED)
+                if next_row in done:
+                    batch.append(next_row.result())
+                else:
+                    next_row.cancel()
+            if scoring is not None:
+                await scoring
+            with self._lock:
+                self._pending -= len(batch)
+            scoring = loop.run_in_executor(executor, self._score, batch)
+
+    def _score(self, batch):
+        started = time.perf_counter()
+        if self.metrics is not None:
+            self.metrics.observe_batch(len(batch), [started - enqueued for _, _, _, enqueued in batch])
+
+        # Normally one group; a hot reload mid-window can split a batch across models
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            try:
+                X = np.stack([row for _, row, _, _ in items])
+                incident_probs = self.score_fn(items[0][0], X)
+                for (_, _, future, _), prob in zip(items, incident_probs):
+                    future.set_result(float(prob))
+            except Exception as e:
+                for _, _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
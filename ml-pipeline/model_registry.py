@@ -0,0 +1,321 @@
+"""
+Model Registry - Loads, validates and atomically swaps the served model
+A reload builds a complete LoadedModel off the request path and publishes it
+with a single reference assignment, so requests see either the old model or
+the new one, never a half-loaded mix.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from rolling_features import RollingFeatureSpec
+from tree_engine import TreeEnsemble, serving_booster
+
+MANIFEST_FILE = 'model_manifest.json'
+
+def resolve_models_dir():
+    """MODEL_DIR, else models/ or ../models/ (Docker vs. running from ml-pipeline/)"""
+    if os.environ.get('MODEL_DIR'):
+        return os.environ['MODEL_DIR']
+    return 'models' if os.path.isdir('models') else '../models'
+
+def available_cores():
+    """Cores this process may run on (respects CPU affinity / container cpusets)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def file_checksum(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class PhaseTimer:
+    """Accumulates wall-clock seconds per named phase"""
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+
+class LoadedModel:
+    """One loaded artifact: the scorer, its feature order and its version"""
+
+    def __init__(self, model, feature_names, version, engine, source_path, manifest=None):
+        self.model = model
+        self.feature_names = feature_names
+        self.version = version
+        self.engine = engine
+        self.source_path = source_path
+        self.manifest = manifest or {}
+        # Rolling features (a --temporal model) are computed server-side from input_features
+        self.rolling = RollingFeatureSpec(feature_names, self.manifest['rolling']) if self.manifest.get('rolling') else None
+        self.input_features = self.rolling.input_features if self.rolling else feature_names
+        self.loaded_at = time.time()
+        self.load_phases = {}
+        # Per-model state owned by the server (e.g. the prediction cache)
+        self.cache = None
+        self.explainer = None
+        self.explanation_cache = None
+        self.drift = None
+
+    def describe(self):
+        return {
+            'model_version': self.version,
+            'engine': self.engine,
+            'source': self.source_path,
+            'features': len(self.feature_names),
+            'rolling_features': len(self.rolling.columns) if self.rolling else 0,
+            'loaded_at': self.loaded_at,
+            'trained_at': self.manifest.get('trained_at'),
+            'load_seconds': self.load_phases,
+        }
+
+
+def load_model(model_engine='auto', models_dir=None):
+    """Load and validate the model artifacts; raises if they are unusable
+
+    model_engine: 'auto' uses the NumPy tree engine when its bundle matches the
+    model, 'native' requires it, 'xgboost' loads the booster. The manifest
+    written by train_model.py is preferred; model.pkl is the legacy fallback.
+    models_dir defaults to resolve_models_dir().
+    """
+    models_dir = models_dir or resolve_models_dir()
+    timer = PhaseTimer()
+    if os.path.exists(os.path.join(models_dir, MANIFEST_FILE)):
+        loaded = _load_from_manifest(models_dir, model_engine, timer)
+    else:
+        loaded = _load_legacy(models_dir, model_engine, timer)
+    with timer.phase('warm_up'):
+        validate_model(loaded)
+    loaded.load_phases = timer.phases
+    return loaded
+
+def _load_from_manifest(models_dir, model_engine, timer):
+    with timer.phase('read_manifest'):
+        with open(os.path.join(models_dir, MANIFEST_FILE), 'r') as f:
+            manifest = json.load(f)
+        feature_names = manifest['features']
+        artifacts = manifest['artifacts']
+
+    def verified_path(name):
+        entry = artifacts.get(name)
+        if not entry:
+            return None
+        path = os.path.join(models_dir, entry['file'])
+        with timer.phase('verify_checksums'):
+            if not os.path.exists(path) or file_checksum(path) != entry['sha256']:
+                raise ValueError(f"{path} does not match the checksum in {MANIFEST_FILE}")
+        return path
+
+    version = f"xgboost-{artifacts['booster']['sha256'][:12]}"
+    trees_path = None
+    if model_engine != 'xgboost':
+        try:
+            trees_path = verified_path('trees')
+        except ValueError as e:
+            if model_engine == 'native':
+                raise
+            print(f"Warning: {e}, using xgboost")
+    if trees_path:
+        with timer.phase('load_model'):
+            model = TreeEnsemble.load(trees_path)
+        return LoadedModel(model, feature_names, version, 'native', trees_path, manifest)
+    if model_engine == 'native':
+        raise FileNotFoundError(f"MODEL_ENGINE=native but {MANIFEST_FILE} lists no tree bundle")
+
+    booster_path = verified_path('booster')
+    with timer.phase('import_xgboost'):
+        import xgboost as xgb
+    with timer.phase('load_model'):
+        model = xgb.XGBClassifier()
+        model.load_model(booster_path)
+        _apply_inference_threads(model)
+    return LoadedModel(model, feature_names, version, 'xgboost', booster_path, manifest)
+
+def _load_legacy(models_dir, model_engine, timer):
+    """Pre-manifest layout: features.txt, model.pkl and an optional model_trees.npz"""
+    model_path = os.path.join(models_dir, 'model.pkl')
+    trees_path = os.path.join(models_dir, 'model_trees.npz')
+    features_path = os.path.join(models_dir, 'features.txt')
+
+    with timer.phase('read_features'):
+        with open(features_path, 'r') as f:
+            feature_names = [line.strip() for line in f if line.strip()]
+    with timer.phase('verify_checksums'):
+        model_checksum = file_checksum(model_path) if os.path.exists(model_path) else None
+
+    if model_engine != 'xgboost' and os.path.exists(trees_path):
+        with timer.phase('load_model'):
+            trees = TreeEnsemble.load(trees_path)
+        if model_engine == 'native' or model_checksum is None or trees.source_checksum == model_checksum:
+            checksum = trees.source_checksum or file_checksum(trees_path)
+            return LoadedModel(trees, feature_names, f'xgboost-{checksum[:12]}', 'native', trees_path)
+        print(f"Warning: {trees_path} was not exported from {model_path}, using xgboost")
+
+    if model_engine == 'native':
+        raise FileNotFoundError(f"MODEL_ENGINE=native but {trees_path} is missing")
+    with timer.phase('load_model'):
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        _apply_inference_threads(model)
+    return LoadedModel(model, feature_names, f'xgboost-{model_checksum[:12]}', 'xgboost', model_path)
+
+def _apply_inference_threads(model):
+    inference_threads = int(os.environ.get('MODEL_INFERENCE_THREADS', 0))
+    if inference_threads:
+        model.set_params(n_jobs=inference_threads)
+
+def load_booster(loaded):
+    """The xgboost booster behind a loaded model, for what only xgboost computes (tree contributions)
+
+    The native engine has no booster of its own: its source artifact is
+    loaded and must hash to the served version, so explanations always
+    come from the trees being served.
+    """
+    import xgboost as xgb
+    if loaded.engine == 'xgboost':
+        return serving_booster(loaded.model)
+    models_dir = os.path.dirname(loaded.source_path)
+    entry = loaded.manifest.get('artifacts', {}).get('booster')
+    path = os.path.join(models_dir, entry['file'] if entry else 'model.pkl')
+    if not os.path.exists(path) or f"xgboost-{file_checksum(path)[:12]}" != loaded.version:
+        raise FileNotFoundError(f"{path} is missing or is not the source of the served model {loaded.version}")
+    if entry:
+        model = xgb.XGBClassifier()
+        model.load_model(path)
+    else:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+    _apply_inference_threads(model)
+    return serving_booster(model)
+
+def validate_model(loaded):
+    """Check the feature count and warm the model up with one prediction"""
+    if not loaded.feature_names:
+        raise ValueError("The model artifacts list no features")
+    expected = getattr(loaded.model, 'num_features', None) or getattr(loaded.model, 'n_features_in_', None)
+    if expected is not None and expected != len(loaded.feature_names):
+        raise ValueError(f"Model expects {expected} features but the artifacts list {len(loaded.feature_names)}")
+    warm_up = loaded.model.predict_proba(np.zeros((1, len(loaded.feature_names)), dtype=np.float32))
+    if warm_up.shape != (1, 2) or not (0.0 <= float(warm_up[0, 1]) <= 1.0):
+        raise ValueError(f"Warm-up prediction returned an invalid result: {warm_up!r}")
+
+
+class ModelRegistry:
+    """Holds the current LoadedModel and replaces it on reload
+
+    models_dir is what watch() polls; None follows resolve_models_dir().
+    Created before gunicorn forks, the reload generation lives in shared
+    memory: request_reload() bumps it and every worker's follow_reloads()
+    thread reloads too, so one POST /admin/reload reaches all workers.
+    """
+
+    def __init__(self, loader, models_dir=None):
+        self._loader = loader
+        self.models_dir = models_dir
+        self._reload_lock = threading.Lock()
+        self._generation = multiprocessing.Value('Q', 0)
+        self._seen_generation = 0
+        self.current = None
+        self.last_reload = None
+
+    def reload(self):
+        """Load a new model and swap it in; the old model stays on any failure"""
+        with self._reload_lock:
+            started = time.time()
+            try:
+                loaded = self._loader()
+            except Exception as e:
+                self.last_reload = {'status': 'failed', 'error': str(e), 'at': started}
+                print(f"Warning: Model reload failed, keeping {self.version}: {e}")
+                return False
+            previous = self.version
+            # Single reference assignment: in-flight requests keep the object they already hold
+            self.current = loaded
+            self.last_reload = {
+                'status': 'ok',
+                'previous_version': previous,
+                'model_version': loaded.version,
+                'seconds': time.time() - started,
+                'at': started,
+            }
+            print(f"Model {loaded.version} loaded from {loaded.source_path} ({loaded.engine})")
+            return True
+
+    def reload_async(self):
+        """Reload on a background thread; returns False if a reload is already running"""
+        if self._reload_lock.locked():
+            return False
+        threading.Thread(target=self.reload, name='model-reload', daemon=True).start()
+        return True
+
+    def request_reload(self):
+        """Reload here on a background thread and ask every other worker to follow
+
+        Returns False if a reload is already running in this process.
+        """
+        if not self.reload_async():
+            return False
+        with self._generation.get_lock():
+            # Marked seen first so this process's follower does not reload a second time
+            self._seen_generation = self._generation.value + 1
+            self._generation.value = self._seen_generation
+        return True
+
+    def follow_reloads(self, interval=0.5):
+        """Reload whenever another process calls request_reload() (one shared-memory read per poll)"""
+        self._seen_generation = self._generation.value
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                generation = self._generation.value
+                if generation != self._seen_generation:
+                    self._seen_generation = generation
+                    self.reload()
+
+        threading.Thread(target=poll, name='model-reload-follower', daemon=True).start()
+
+    def watch(self, interval):
+        """Poll the model and features files and reload when they change"""
+        def fingerprint():
+            stats = []
+            models_dir = self.models_dir or resolve_models_dir()
+            for name in (MANIFEST_FILE, 'model.ubj', 'model.pkl', 'model_trees.npz', 'features.txt'):
+                path = os.path.join(models_dir, name)
+                try:
+                    stat = os.stat(path)
+                    stats.append((path, stat.st_mtime_ns, stat.st_size))
+                except FileNotFoundError:
+                    stats.append((path, None, None))
+            return stats
+
+        def poll():
+            seen = fingerprint()
+            while True:
+                time.sleep(interval)
+                current = fingerprint()
+                if current != seen:
+                    # Let a writer finish before loading (files are not written atomically)
+                    time.sleep(min(interval, 1.0))
+                    seen = fingerprint()
+                    self.reload()
+
+        threading.Thread(target=poll, name='model-watcher', daemon=True).start()
+
+    @property
+    def version(self):
+        return self.current.version if self.current else None
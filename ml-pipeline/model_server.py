@@ -1,108 +1,703 @@
 """
 Model Server - Serves XGBoost predictions via HTTP
 """
-from flask import Flask, request, jsonify
-import pickle
+import time
+_startup_began = time.perf_counter()
+
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from functools import wraps
 import numpy as np
 import os
+import threading
+# xgboost is imported by the registry only when the booster itself is served
+from model_registry import ModelRegistry, load_booster, load_model
+from prediction_cache import PredictionCache, combined_stats, parse_bucket_widths
+from server_metrics import NULL_TIMER, ServerMetrics, WorkerStats
+from micro_batcher import MicroBatcher, QueueFull
+from ndjson_stream import score_stream
+from explanations import Explainer
+from drift_monitor import DriftMonitor
+from shadow_evaluator import ShadowEvaluator
+from prediction_log import PredictionLog
+import wire_format
+from wire_format import WireFormatError, decode_matrix
+
+# Cold-start time per phase, reported on /health
+startup_seconds = {'imports': time.perf_counter() - _startup_began}
 
 app = Flask(__name__)
 
+# auto: NumPy tree engine when a matching bundle exists, otherwise xgboost
+# native: NumPy tree engine only (xgboost not required)
+# xgboost: unpickle the XGBClassifier
+model_engine = os.environ.get('MODEL_ENGINE', 'auto')
+
+# Per-stage latency and request metrics on /metrics; METRICS_ENABLED=0 turns them off
+metrics = ServerMetrics(enabled=os.environ.get('METRICS_ENABLED', '1') != '0')
+
+def instrumented(endpoint):
+    """Track in-flight count and total latency; the view laps its own stages on g.timer"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g.timer = metrics.start_request(endpoint)
+            try:
+                return view(*args, **kwargs)
+            finally:
+                metrics.finish_request(g.timer)
+        return wrapper
+    return decorator
+
+# Opt-in prediction cache: PREDICTION_CACHE_SIZE > 0 enables it
+cache_size = int(os.environ.get('PREDICTION_CACHE_SIZE', 0))
+cache_ttl = float(os.environ.get('PREDICTION_CACHE_TTL', 30))
+cache_buckets = parse_bucket_widths(os.environ.get('PREDICTION_CACHE_BUCKETS', ''))
+# /explain contribution rows are cached next to the probabilities, under the same keys and TTL
+explanation_cache_size = int(os.environ.get('EXPLANATION_CACHE_SIZE', cache_size))
+
+# Feature drift vs. the manifest's training histograms, on by default: DRIFT_MONITOR=0 turns it off
+drift_enabled = os.environ.get('DRIFT_MONITOR', '1') != '0'
+drift_window = int(os.environ.get('DRIFT_WINDOW', 10000))
+drift_slots = int(os.environ.get('DRIFT_WINDOW_SLOTS', 10))
+drift_min_samples = int(os.environ.get('DRIFT_MIN_SAMPLES', 100))
+
+def load_served_model():
+    """Load the model with its own prediction cache, so a swap never serves stale entries"""
+    loaded = load_model(model_engine)
+    if cache_size > 0:
+        loaded.cache = PredictionCache(loaded.feature_names, cache_size, cache_ttl, cache_buckets)
+    if explanation_cache_size > 0:
+        loaded.explanation_cache = PredictionCache(loaded.feature_names, explanation_cache_size, cache_ttl,
+                                                   cache_buckets, width=len(loaded.feature_names) + 1)
+    if drift_enabled and loaded.manifest.get('drift_reference'):
+        loaded.drift = DriftMonitor(loaded.manifest['drift_reference'], loaded.feature_names,
+                                    drift_window, drift_slots, drift_min_samples)
+    return loaded
+
 # Load model and features at startup
 print("Loading model...")
-# Check both possible paths for Docker compatibility
-model_path = 'models/model.pkl' if os.path.exists('models/model.pkl') else '../models/model.pkl'
-features_path = 'models/features.txt' if os.path.exists('models/features.txt') else '../models/features.txt'
-
-try:
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-    print(f"Model loaded from {model_path}")
-except Exception as e:
-    print(f"Warning: Could not load model from {model_path}: {e}")
-    model = None
-
-try:
-    with open(features_path, 'r') as f:
-        feature_names = [line.strip() for line in f.readlines()]
-    print(f"Features loaded! Expecting {len(feature_names)} features")
-except Exception as e:
-    print(f"Warning: Could not load features from {features_path}: {e}")
-    feature_names = []
+registry = ModelRegistry(load_served_model)
+if registry.reload():
+    print(f"Features loaded! Expecting {len(registry.current.feature_names)} features")
+    if cache_size > 0:
+        print(f"Prediction cache enabled: {cache_size} entries, {cache_ttl}s TTL")
+    startup_seconds.update(registry.current.load_phases)
+
+# Optional candidate model scored on the same traffic in the background: SHADOW_MODEL_DIR enables it
+shadow_model_dir = os.environ.get('SHADOW_MODEL_DIR')
+shadow_registry = None
+shadow = None
+if shadow_model_dir:
+    shadow_registry = ModelRegistry(lambda: load_model(model_engine, shadow_model_dir), shadow_model_dir)
+    shadow_registry.reload()
+    shadow = ShadowEvaluator(
+        shadow_registry,
+        lambda incident_prob: assess_risk(incident_prob)[0],
+        max_queue_size=int(os.environ.get('SHADOW_QUEUE_SIZE', 256)),
+        workers=int(os.environ.get('SHADOW_WORKERS', 1)),
+        sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', 1.0))
+    )
+    print(f"Shadow model {shadow_registry.version} from {shadow_model_dir}: "
+          f"{shadow.num_workers} worker(s), queue of {shadow.max_queue_size}")
+
+# Optional capture of scored rows for replay and retraining: PREDICTION_LOG_DIR enables it
+prediction_log = None
+if os.environ.get('PREDICTION_LOG_DIR'):
+    prediction_log = PredictionLog(
+        os.environ['PREDICTION_LOG_DIR'],
+        max_segment_bytes=int(float(os.environ.get('PREDICTION_LOG_SEGMENT_MB', 64)) * 1024 * 1024),
+        max_segments=int(os.environ.get('PREDICTION_LOG_MAX_SEGMENTS', 0))
+    )
+    print(f"Capturing predictions to {prediction_log.log_dir}")
+startup_seconds['total'] = time.perf_counter() - _startup_began
+print("Cold start: " + ", ".join(f"{phase} {seconds * 1000:.1f}ms" for phase, seconds in startup_seconds.items()))
+
+def start_model_watcher():
+    """Reload automatically when the model files change (MODEL_WATCH_INTERVAL seconds, 0 = off)
+
+    Also follows /admin/reload requests handled by other worker processes.
+    """
+    registry.follow_reloads()
+    if shadow_registry is not None:
+        shadow_registry.follow_reloads()
+    interval = float(os.environ.get('MODEL_WATCH_INTERVAL', 0))
+    if interval > 0:
+        registry.watch(interval)
+        if shadow_registry is not None:
+            shadow_registry.watch(interval)
+        print(f"Watching model files every {interval}s")
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy', 'model': 'loaded' if model else 'not loaded'})
+    loaded = registry.current
+    response = {'status': 'healthy', 'model': 'loaded' if loaded else 'not loaded'}
+    if loaded:
+        response.update(loaded.describe())
+    if registry.last_reload:
+        response['last_reload'] = registry.last_reload
+    response['cold_start_seconds'] = startup_seconds
+    # Under gunicorn each worker answers for itself
+    response['pid'] = os.getpid()
+    return jsonify(response)
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Load, validate and swap in the model files on a background thread (?target=shadow: the candidate)"""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if admin_token and request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({'error': 'Unauthorized'}), 401
+    target = registry
+    if request.args.get('target', 'primary') not in ('primary', 'shadow'):
+        return jsonify({'error': 'target must be primary or shadow'}), 400
+    if request.args.get('target') == 'shadow':
+        if shadow_registry is None:
+            return jsonify({'error': 'No shadow model configured (SHADOW_MODEL_DIR)'}), 404
+        target = shadow_registry
+    # Every gunicorn worker reloads, not just the one that took this request
+    if not target.request_reload():
+        return jsonify({'status': 'reload already in progress', 'model_version': target.version}), 409
+    return jsonify({'status': 'reloading', 'model_version': target.version}), 202
+
+def assess_risk(incident_prob):
+    """Map an incident probability to a risk level and recommendation"""
+    if incident_prob < 0.3:
+        return "low", "System stable. Continue monitoring."
+    elif incident_prob < 0.6:
+        return "medium", "Increased risk detected. Review metrics and prepare for scaling."
+    elif incident_prob < 0.8:
+        return "high", "High risk! Scale up resources immediately."
+    else:
+        return "critical", "CRITICAL! Incident imminent. Execute incident response plan NOW."
+
+# (feature, threshold, incident type) in priority order
+INCIDENT_RULES = [
+    ('database_cpu', 80, "database_overload"),
+    ('api_gateway_latency', 1000, "high_latency"),
+    ('slo_violation_count', 5, "slo_breach"),
+]
+
+def classify_incident_type(data):
+    """Determine incident type based on metrics"""
+    for feature, threshold, incident_type in INCIDENT_RULES:
+        if feature in data and data[feature] > threshold:
+            return incident_type
+    return "unknown"
+
+def classify_incident_types(X, feature_names):
+    """classify_incident_type for every row of a feature matrix"""
+    incident_types = np.full(len(X), "unknown", dtype=object)
+    column = {name: i for i, name in enumerate(feature_names)}
+    # Lowest priority first so higher-priority rules overwrite it
+    for feature, threshold, incident_type in reversed(INCIDENT_RULES):
+        if feature in column:
+            incident_types[X[:, column[feature]] > threshold] = incident_type
+    return incident_types.tolist()
+
+def build_feature_matrix(snapshots, feature_names):
+    """Assemble snapshots into one (N, len(feature_names)) matrix in feature order"""
+    # Use default values for missing features
+    return np.array(
+        [[snapshot.get(name, 0.0) for name in feature_names] for snapshot in snapshots],
+        dtype=np.float32
+    ).reshape(len(snapshots), len(feature_names))
+
+def build_response(incident_prob, incident_type, model_version):
+    """Build the prediction response for one snapshot"""
+    incident_prob = float(incident_prob)
+    risk_level, recommendation = assess_risk(incident_prob)
+    
+    return {
+        'incident_probability': incident_prob,
+        'risk_level': risk_level,
+        'confidence': max(incident_prob, 1.0 - incident_prob),
+        'predicted_incident_type': incident_type,
+        'recommendation': recommendation,
+        'model_version': model_version,
+        # Same cut-off as XGBClassifier.predict (p > 0.5), without a second model call
+        'prediction': int(incident_prob > 0.5)
+    }
+
+def predict_incident_probs(loaded, X, keys=None):
+    """Incident probability per row, served from the prediction cache where possible"""
+    if loaded.cache is None:
+        return loaded.model.predict_proba(X)[:, 1]
+    
+    keys = loaded.cache.keys_for(X) if keys is None else keys
+    incident_probs = loaded.cache.get_many(keys)
+    misses = np.isnan(incident_probs)
+    if misses.any():
+        incident_probs[misses] = loaded.model.predict_proba(X[misses])[:, 1]
+        loaded.cache.put_many([key for key, miss in zip(keys, misses) if miss], incident_probs[misses])
+    return incident_probs
+
+# Opt-in micro-batching of concurrent /predict calls: MICRO_BATCH_MAX_SIZE > 1 enables it.
+# Needs a threaded server (the dev server, or gunicorn with MODEL_SERVER_THREADS > 1).
+micro_batch_size = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 0))
+micro_batch_timeout = float(os.environ.get('MICRO_BATCH_TIMEOUT', 5))
+micro_batcher = None
+if micro_batch_size > 1:
+    micro_batcher = MicroBatcher(
+        predict_incident_probs,
+        max_batch_size=micro_batch_size,
+        max_wait_ms=float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2)),
+        max_queue_size=int(os.environ.get('MICRO_BATCH_QUEUE_SIZE', 1024)),
+        metrics=metrics
+    )
+    print(f"Micro-batching enabled: up to {micro_batch_size} rows per {micro_batcher.max_wait * 1000:g}ms window")
+
+def model_matrix(loaded, X, timer=NULL_TIMER, rolling_state=None):
+    """(N, input_features) rows -> the model's (N, features) matrix, rolling features appended
+
+    Every row scored passes through here, so this is also where the drift
+    monitor sees the traffic.
+    """
+    model_X = X
+    if loaded.rolling is not None:
+        model_X = loaded.rolling.expand(X, rolling_state)
+        timer.lap('rolling_features')
+    if loaded.drift is not None:
+        loaded.drift.update(model_X)
+        timer.lap('drift')
+    return model_X
+
+def score_matrix(loaded, X, incident_types=None, timer=NULL_TIMER, single=False, rolling_state=None):
+    """Score (N, input_features) rows; single rows go through the micro-batcher when enabled
+
+    A --temporal model gets its rolling features appended here: from
+    rolling_state when the rows are consecutive snapshots of one feed, else
+    from a cold window per row. Stateless rows are also captured to the
+    prediction log and offered to the shadow model, if enabled.
+    """
+    model_X = model_matrix(loaded, X, timer, rolling_state)
+    if single and micro_batcher is not None:
+        incident_probs = [micro_batcher.submit(loaded, model_X[0]).result(timeout=micro_batch_timeout)]
+    else:
+        incident_probs = predict_incident_probs(loaded, model_X)
+    timer.lap('inference')
+    if prediction_log is not None and rolling_state is None:
+        try:
+            prediction_log.append(loaded.input_features, X, incident_probs, loaded.version)
+        except OSError as e:
+            # Capture is best effort: a full disk must not fail the prediction
+            metrics.count_error('prediction_log', type(e).__name__)
+        timer.lap('capture')
+    if shadow is not None and rolling_state is None:
+        shadow.submit(loaded, X, incident_probs)
+        timer.lap('shadow_submit')
+    if incident_types is None:
+        incident_types = classify_incident_types(X, loaded.input_features)
+    predictions = [build_response(prob, incident_type, loaded.version)
+                   for prob, incident_type in zip(incident_probs, incident_types)]
+    timer.lap('rules')
+    return predictions
+
+def score_snapshots(loaded, snapshots, timer=NULL_TIMER, single=False, rolling_state=None):
+    """Score a list of JSON snapshots with a single predict_proba pass"""
+    X = build_feature_matrix(snapshots, loaded.input_features)
+    timer.lap('assemble')
+    # Rules see the raw snapshot, so absent metrics never trigger them
+    incident_types = [classify_incident_type(data) for data in snapshots]
+    return score_matrix(loaded, X, incident_types, timer, single, rolling_state)
+
+def json_snapshots(single=False):
+    """Snapshots in the JSON body, or None if it is not one object (single) or a list of them
+
+    Batches may also be wrapped as {"snapshots": [...]}.
+    """
+    data = request.get_json(silent=True)
+    if single:
+        return [data] if isinstance(data, dict) else None
+    snapshots = data.get('snapshots') if isinstance(data, dict) else data
+    if isinstance(snapshots, list) and all(isinstance(snapshot, dict) for snapshot in snapshots):
+        return snapshots
+    return None
+
+def read_binary_features(loaded):
+    """Feature matrix from a float32 wire-format body, validated against the model's schema"""
+    return decode_matrix(request.get_data(cache=False), loaded.input_features,
+                         request.headers.get(wire_format.SCHEMA_HEADER))
 
 @app.route('/predict', methods=['POST'])
+@instrumented('predict')
 def predict():
-    if not model:
+    # Take one reference for the whole request; a concurrent reload swaps the registry, not this
+    loaded = registry.current
+    if not loaded:
+        metrics.count_error('predict', 'model_not_loaded')
         return jsonify({'error': 'Model not loaded'}), 500
         
     try:
-        data = request.json
+        if request.mimetype == wire_format.MIMETYPE:
+            X = read_binary_features(loaded)
+            if len(X) != 1:
+                raise WireFormatError(f"/predict takes exactly one row, got {len(X)}; use /predict/batch")
+            g.timer.lap('parse')
+            prediction = score_matrix(loaded, X, timer=g.timer, single=True)[0]
+        else:
+            snapshots = json_snapshots(single=True)
+            g.timer.lap('parse')
+            if snapshots is None:
+                metrics.count_error('predict', 'bad_request')
+                return jsonify({'error': 'Expected one JSON snapshot object'}), 400
+            prediction = score_snapshots(loaded, snapshots, g.timer, single=True)[0]
+        response = jsonify(prediction)
+        g.timer.lap('serialize')
+        metrics.count_predictions('predict', [prediction])
+        return response
         
-        # Extract features in correct order
-        features = []
-        for feature_name in feature_names:
-            if feature_name in data:
-                features.append(data[feature_name])
-            else:
-                # Use default values for missing features
-                features.append(0.0)
+    except WireFormatError as e:
+        metrics.count_error('predict', 'bad_request')
+        return jsonify({'error': str(e)}), e.status
+    except QueueFull as e:
+        # Backpressure: shed load instead of queueing without bound
+        metrics.count_error('predict', 'queue_full')
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+    except Exception as e:
+        metrics.count_error('predict', type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/predict/batch', methods=['POST'])
+@instrumented('predict_batch')
+def predict_batch():
+    """Score many snapshots in one request: {"snapshots": [{...}, ...]} or a float32 matrix body"""
+    # Take one reference for the whole request; a concurrent reload swaps the registry, not this
+    loaded = registry.current
+    if not loaded:
+        metrics.count_error('predict_batch', 'model_not_loaded')
+        return jsonify({'error': 'Model not loaded'}), 500
         
-        # Convert to numpy array
-        X = np.array([features], dtype=np.float32)
+    try:
+        if request.mimetype == wire_format.MIMETYPE:
+            X = read_binary_features(loaded)
+            g.timer.lap('parse')
+            predictions = score_matrix(loaded, X, timer=g.timer)
+        else:
+            snapshots = json_snapshots()
+            g.timer.lap('parse')
+            if snapshots is None:
+                metrics.count_error('predict_batch', 'bad_request')
+                return jsonify({'error': 'Expected {"snapshots": [...]} or a list of snapshot objects'}), 400
+            if not snapshots:
+                return jsonify({'predictions': [], 'count': 0})
+            predictions = score_snapshots(loaded, snapshots, g.timer)
         
-        # Get prediction
-        prob = model.predict_proba(X)[0]
-        prediction = model.predict(X)[0]
+        response = jsonify({'predictions': predictions, 'count': len(predictions)})
+        g.timer.lap('serialize')
+        metrics.count_predictions('predict_batch', predictions)
+        return response
         
-        # Determine risk level and recommendation
-        incident_prob = prob[1]
+    except WireFormatError as e:
+        metrics.count_error('predict_batch', 'bad_request')
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        metrics.count_error('predict_batch', type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+
+# /predict/stream scores up to STREAM_BATCH_SIZE lines per call, flushing a partial
+# batch once its first line is STREAM_MAX_WAIT_MS old
+stream_batch_size = int(os.environ.get('STREAM_BATCH_SIZE', 256))
+stream_max_wait = float(os.environ.get('STREAM_MAX_WAIT_MS', 50)) / 1000.0
+
+def score_stream_batch(snapshots, stream):
+    """Score one batch of a feed against whichever model is current, so long feeds pick up reloads
+
+    stream holds the feed's rolling windows between batches; they restart
+    only if a reload brings a different rolling-feature layout.
+    """
+    timer = metrics.start_request('predict_stream_batch')
+    try:
+        loaded = registry.current
+        if not loaded:
+            raise RuntimeError('Model not loaded')
+        if loaded.rolling is not None and stream.get('config') != loaded.rolling.config:
+            stream['config'] = loaded.rolling.config
+            stream['state'] = loaded.rolling.new_state()
+        rolling_state = stream.get('state') if loaded.rolling is not None else None
+        predictions = score_snapshots(loaded, snapshots, timer, rolling_state=rolling_state)
+        metrics.count_predictions('predict_stream', predictions)
+        return predictions
+    except Exception as e:
+        # The response is already streaming: report the failure in place of each prediction
+        metrics.count_error('predict_stream', type(e).__name__)
+        return [{'error': str(e)}] * len(snapshots)
+    finally:
+        metrics.finish_request(timer)
+
+@app.route('/predict/stream', methods=['POST'])
+@instrumented('predict_stream')
+def predict_stream():
+    """Chunked NDJSON snapshots in, NDJSON predictions out in the same order"""
+    if not registry.current:
+        metrics.count_error('predict_stream', 'model_not_loaded')
+        return jsonify({'error': 'Model not loaded'}), 500
+    stream = {}
+    chunks = score_stream(request.stream, lambda snapshots: score_stream_batch(snapshots, stream),
+                          stream_batch_size, stream_max_wait)
+    return Response(stream_with_context(chunks), mimetype='application/x-ndjson')
+
+# /explain: EXPLAIN_METHOD=shap (exact TreeSHAP) or saabas (approximate, far cheaper per row)
+explain_method = os.environ.get('EXPLAIN_METHOD', 'shap')
+explain_top_k = int(os.environ.get('EXPLAIN_TOP_K', 5))
+explainer_lock = threading.Lock()
+
+def explainer_for(loaded):
+    """The model's Explainer, built on first use: it imports xgboost, which native serving avoids"""
+    if loaded.explainer is None:
+        with explainer_lock:
+            if loaded.explainer is None:
+                loaded.explainer = Explainer(load_booster(loaded), loaded.feature_names, loaded.rolling,
+                                             explain_method)
+    return loaded.explainer
+
+def explain_matrix(loaded, X, incident_types=None, timer=NULL_TIMER, top_k=explain_top_k):
+    """score_matrix plus an 'explanation' per row; both share the cache keys of the model rows"""
+    explainer = explainer_for(loaded)
+    model_X = model_matrix(loaded, X, timer)
+    cache = loaded.explanation_cache
+    # Both caches quantize the model rows alike, so the keys are computed once
+    key_cache = loaded.cache or cache
+    keys = key_cache.keys_for(model_X) if key_cache is not None else None
+    incident_probs = predict_incident_probs(loaded, model_X, keys)
+    timer.lap('inference')
+
+    if cache is None:
+        contributions = explainer.contributions(model_X)
+    else:
+        contributions = cache.get_many(keys)
+        misses = np.isnan(contributions[:, -1])
+        if misses.any():
+            contributions[misses] = explainer.contributions(model_X[misses])
+            cache.put_many([key for key, miss in zip(keys, misses) if miss], contributions[misses])
+    timer.lap('contributions')
+
+    if incident_types is None:
+        incident_types = classify_incident_types(X, loaded.input_features)
+    explanations = explainer.explain(model_X, contributions, top_k)
+    timer.lap('explain')
+    predictions = [dict(build_response(prob, incident_type, loaded.version), explanation=explanation)
+                   for prob, incident_type, explanation in zip(incident_probs, incident_types, explanations)]
+    timer.lap('rules')
+    return predictions
+
+def explain_snapshots(loaded, snapshots, timer=NULL_TIMER, top_k=explain_top_k):
+    """explain_matrix for JSON snapshots, with the same raw-snapshot rules as score_snapshots"""
+    X = build_feature_matrix(snapshots, loaded.input_features)
+    timer.lap('assemble')
+    incident_types = [classify_incident_type(data) for data in snapshots]
+    return explain_matrix(loaded, X, incident_types, timer, top_k)
+
+@app.route('/explain', methods=['POST'])
+@instrumented('explain')
+def explain():
+    """A /predict response plus each feature's contribution and the likely service and incident type"""
+    loaded = registry.current
+    if not loaded:
+        metrics.count_error('explain', 'model_not_loaded')
+        return jsonify({'error': 'Model not loaded'}), 500
         
-        if incident_prob < 0.3:
-            risk_level = "low"
-            recommendation = "System stable. Continue monitoring."
-        elif incident_prob < 0.6:
-            risk_level = "medium"
-            recommendation = "Increased risk detected. Review metrics and prepare for scaling."
-        elif incident_prob < 0.8:
-            risk_level = "high"
-            recommendation = "High risk! Scale up resources immediately."
+    try:
+        top_k = max(0, request.args.get('top', explain_top_k, type=int))
+        if request.mimetype == wire_format.MIMETYPE:
+            X = read_binary_features(loaded)
+            if len(X) != 1:
+                raise WireFormatError(f"/explain takes exactly one row, got {len(X)}; use /explain/batch")
+            g.timer.lap('parse')
+            prediction = explain_matrix(loaded, X, timer=g.timer, top_k=top_k)[0]
         else:
-            risk_level = "critical"
-            recommendation = "CRITICAL! Incident imminent. Execute incident response plan NOW."
+            snapshots = json_snapshots(single=True)
+            g.timer.lap('parse')
+            if snapshots is None:
+                metrics.count_error('explain', 'bad_request')
+                return jsonify({'error': 'Expected one JSON snapshot object'}), 400
+            prediction = explain_snapshots(loaded, snapshots, g.timer, top_k)[0]
+        response = jsonify(prediction)
+        g.timer.lap('serialize')
+        metrics.count_predictions('explain', [prediction])
+        return response
         
-        # Determine incident type based on metrics
-        incident_type = "unknown"
-        if 'database_cpu' in data and data['database_cpu'] > 80:
-            incident_type = "database_overload"
-        elif 'api_gateway_latency' in data and data['api_gateway_latency'] > 1000:
-            incident_type = "high_latency"
-        elif 'slo_violation_count' in data and data['slo_violation_count'] > 5:
-            incident_type = "slo_breach"
+    except WireFormatError as e:
+        metrics.count_error('explain', 'bad_request')
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        metrics.count_error('explain', type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/explain/batch', methods=['POST'])
+@instrumented('explain_batch')
+def explain_batch():
+    """/explain for many snapshots: {"snapshots": [{...}, ...]} or a float32 matrix body"""
+    loaded = registry.current
+    if not loaded:
+        metrics.count_error('explain_batch', 'model_not_loaded')
+        return jsonify({'error': 'Model not loaded'}), 500
         
-        response = {
-            'incident_probability': float(incident_prob),
-            'risk_level': risk_level,
-            'confidence': float(max(prob)),
-            'predicted_incident_type': incident_type,
-            'recommendation': recommendation,
-            'model_version': 'xgboost_v1',
-            'prediction': int(prediction)
-        }
+    try:
+        top_k = max(0, request.args.get('top', explain_top_k, type=int))
+        if request.mimetype == wire_format.MIMETYPE:
+            X = read_binary_features(loaded)
+            g.timer.lap('parse')
+            predictions = explain_matrix(loaded, X, timer=g.timer, top_k=top_k)
+        else:
+            snapshots = json_snapshots()
+            g.timer.lap('parse')
+            if snapshots is None:
+                metrics.count_error('explain_batch', 'bad_request')
+                return jsonify({'error': 'Expected {"snapshots": [...]} or a list of snapshot objects'}), 400
+            if not snapshots:
+                return jsonify({'predictions': [], 'count': 0})
+            predictions = explain_snapshots(loaded, snapshots, g.timer, top_k)
         
-        return jsonify(response)
+        response = jsonify({'predictions': predictions, 'count': len(predictions)})
+        g.timer.lap('serialize')
+        metrics.count_predictions('explain_batch', predictions)
+        return response
         
+    except WireFormatError as e:
+        metrics.count_error('explain_batch', 'bad_request')
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
+        metrics.count_error('explain_batch', type(e).__name__)
         return jsonify({'error': str(e)}), 500
 
+# (metric, type, help, key in a ShadowComparison summary) exported per primary/candidate pair
+SHADOW_COMPARISON_METRICS = [
+    ('model_server_shadow_rows_total', 'counter', 'Rows scored by both models', 'rows'),
+    ('model_server_shadow_agreement_rate', 'gauge', 'Share of rows with the same 0.5 decision', 'agreement_rate'),
+    ('model_server_shadow_risk_flip_rate', 'gauge', 'Share of rows whose risk level differs', 'risk_flip_rate'),
+    ('model_server_shadow_mean_abs_delta', 'gauge', 'Mean |candidate - primary| probability', 'mean_abs_delta'),
+]
+
+def metrics_extra():
+    """This worker's /metrics series beyond ServerMetrics' own (drift is added from the merged window)"""
+    # Gauges are exported per worker; counters are summed across workers
+    worker = {'pid': str(os.getpid())} if worker_stats is not None else {}
+    extra = [('model_server_cold_start_seconds', 'gauge', 'Server cold-start time per phase',
+              {'phase': phase, **worker}, seconds) for phase, seconds in startup_seconds.items()]
+    loaded = registry.current
+    if loaded:
+        extra.append(('model_server_model_info', 'gauge', 'Currently served model',
+                      {'version': loaded.version, 'engine': loaded.engine, **worker}, 1))
+        extra += [('model_server_model_load_seconds', 'gauge', 'Load time of the served model per phase',
+                   {'phase': phase, **worker}, seconds) for phase, seconds in loaded.load_phases.items()]
+        if loaded.cache is not None:
+            stats = loaded.cache.stats()
+            extra += [('model_server_cache_hits_total', 'counter', 'Prediction cache hits', {}, stats['hits']),
+                      ('model_server_cache_misses_total', 'counter', 'Prediction cache misses', {}, stats['misses'])]
+    if prediction_log is not None:
+        stats = prediction_log.stats()
+        extra += [('model_server_prediction_log_records_total', 'counter', 'Rows captured to the prediction log', {},
+                   stats['records']),
+                  ('model_server_prediction_log_bytes_total', 'counter', 'Bytes appended to the prediction log', {},
+                   stats['bytes_written'])]
+    if shadow is not None:
+        stats = shadow.stats()
+        extra += [('model_server_shadow_samples_total', 'counter', 'Batches offered to the shadow model',
+                   {'outcome': outcome}, stats[outcome])
+                   for outcome in ('submitted', 'dropped', 'skipped', 'schema_mismatch', 'errors')]
+        extra.append(('model_server_shadow_queue_size', 'gauge', 'Batches waiting for the shadow model', worker,
+                      stats['queue_size']))
+        for name, metric_type, help_text, key in SHADOW_COMPARISON_METRICS:
+            pair = {'primary': comparison['primary_version'], 'candidate': comparison['candidate_version']}
+            extra += [(name, metric_type, help_text, pair if metric_type == 'counter' else {**pair, **worker},
+                       comparison[key] or 0.0) for comparison in stats['comparisons']]
+    return extra
+
+def worker_state():
+    """What this worker publishes for the others to merge into /metrics, /drift and /cache"""
+    loaded = registry.current
+    state = {'model_version': registry.version, 'metrics': metrics.state(), 'extra': metrics_extra()}
+    if loaded and loaded.cache is not None:
+        state['cache'] = loaded.cache.stats()
+    if loaded and loaded.explanation_cache is not None:
+        state['explanations'] = loaded.explanation_cache.stats()
+    if loaded and loaded.drift is not None:
+        state['drift'] = loaded.drift.state()
+    return state
+
+# Under gunicorn each worker has its own counters and windows; gunicorn.conf.py sets
+# WORKER_STATS_DIR so they publish them there and any worker can answer for all
+worker_stats = None
+if os.environ.get('WORKER_STATS_DIR'):
+    worker_stats = WorkerStats(os.environ['WORKER_STATS_DIR'], worker_state,
+                               float(os.environ.get('WORKER_STATS_INTERVAL', 1.0)))
+
+def start_worker_stats():
+    """Publish this worker's state every WORKER_STATS_INTERVAL seconds (no-op without WORKER_STATS_DIR)"""
+    if worker_stats is not None:
+        worker_stats.start()
+
+def worker_peers(loaded=None, live=False):
+    """Other workers' published states, optionally only those serving loaded's version / still running"""
+    peers = worker_stats.peers() if worker_stats is not None else []
+    return [peer for peer in peers
+            if (loaded is None or peer['model_version'] == loaded.version) and (peer['alive'] or not live)]
+
+def merged_drift_report(loaded):
+    """loaded.drift's report over the drift windows of every running worker serving the same model"""
+    peers = [peer for peer in worker_peers(loaded, live=True) if 'drift' in peer]
+    return {'workers': 1 + len(peers), **loaded.drift.report([peer['drift'] for peer in peers])}
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics disabled (METRICS_ENABLED=0)'}), 404
+    extra = metrics_extra()
+    loaded = registry.current
+    if loaded and loaded.drift is not None:
+        report = merged_drift_report(loaded)
+        extra.append(('model_server_drift_window_rows', 'gauge', 'Rows in the drift window', {},
+                      report['window_rows']))
+        extra += [('model_server_feature_psi', 'gauge', 'Population stability index vs. training per feature',
+                   {'feature': name}, stats['psi']) for name, stats in report['features'].items()]
+    return Response(metrics.render(extra, worker_peers()), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache', methods=['GET'])
+def cache_stats():
+    """Cache counters summed over every worker that served the current model"""
+    loaded = registry.current
+    if not loaded or loaded.cache is None:
+        return jsonify({'enabled': False})
+    peers = worker_peers(loaded)
+    stats = combined_stats(loaded.cache.stats(), [(peer['cache'], peer['alive']) for peer in peers if 'cache' in peer])
+    explanations = None
+    if loaded.explanation_cache is not None:
+        explanations = combined_stats(loaded.explanation_cache.stats(),
+                                      [(peer['explanations'], peer['alive']) for peer in peers if 'explanations' in peer])
+    return jsonify({'enabled': True, 'model_version': loaded.version, **stats, 'explanations': explanations})
+
+@app.route('/drift', methods=['GET'])
+def drift_report():
+    """PSI per feature of recent traffic (all workers) against the training reference"""
+    loaded = registry.current
+    if not loaded or loaded.drift is None:
+        reason = 'DRIFT_MONITOR=0' if not drift_enabled else 'the model manifest has no drift reference'
+        return jsonify({'enabled': False, 'reason': reason})
+    return jsonify({'enabled': True, 'model_version': loaded.version, **merged_drift_report(loaded)})
+
+@app.route('/shadow', methods=['GET'])
+def shadow_report():
+    """Live comparison of the shadow (candidate) model against the primary, in this worker"""
+    if shadow is None:
+        return jsonify({'enabled': False})
+    # Per worker like /health; the shadow counters on /metrics cover all workers
+    return jsonify({'enabled': True, 'primary_version': registry.version, 'shadow_dir': shadow_model_dir,
+                    'last_reload': shadow_registry.last_reload, 'pid': os.getpid(), **shadow.stats()})
+
 @app.route('/features', methods=['GET'])
 def get_features():
-    return jsonify({'features': feature_names, 'count': len(feature_names)})
+    loaded = registry.current
+    # Clients send input_features; rolling features are computed server-side
+    feature_names = loaded.input_features if loaded else []
+    return jsonify({
+        'features': feature_names,
+        'count': len(feature_names),
+        'rolling_features': loaded.rolling.columns if loaded and loaded.rolling else [],
+        # X-Feature-Schema value for binary (float32) requests
+        'schema_hash': wire_format.schema_hash(feature_names)
+    })
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
+    start_model_watcher()
     print(f"Starting model server on port {port}")
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
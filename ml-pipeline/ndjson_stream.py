@@ -0,0 +1,153 @@
+"""
+NDJSON Stream - Scores an unbounded stream of snapshots in fixed-size batches
+Lines are parsed lazily and scored one batch at a time, so memory is bounded
+by the batch size however long the stream runs. Output keeps input order, with
+an error object in place of any line that is not a JSON snapshot. Backs
+POST /predict/stream and the offline scorer:
+
+    python ndjson_stream.py snapshots.ndjson > predictions.ndjson
+"""
+import argparse
+import contextlib
+import json
+import queue
+import sys
+import threading
+import time
+
+
+def parse_lines(lines):
+    """(line_number, snapshot, error) per non-blank line; exactly one of snapshot/error is set"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            snapshot = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(snapshot, dict):
+            yield number, None, "Expected one JSON object per line"
+            continue
+        yield number, snapshot, None
+
+def batched(items, batch_size, max_wait=None):
+    """Lists of up to batch_size items, also cut max_wait seconds after a batch's first item
+
+    With max_wait, items are read ahead on a thread so a partial batch is
+    flushed on time even while the feed is paused between items.
+    """
+    if max_wait is None:
+        yield from _batched_by_size(items, batch_size)
+        return
+    # Bounded like a batch: a fast feed waits on the reader instead of piling up
+    buffer = queue.Queue(batch_size)
+    failure = []
+    closed = threading.Event()
+    threading.Thread(target=_read_ahead, args=(items, buffer, failure, closed),
+                     name='ndjson-reader', daemon=True).start()
+    try:
+        batch = []
+        while True:
+            if batch and time.monotonic() >= deadline:
+                yield batch
+                batch = []
+            try:
+                item = buffer.get(timeout=max(deadline - time.monotonic(), 0) if batch else None)
+            except queue.Empty:
+                continue
+            if item is _END:
+                break
+            if not batch:
+                deadline = time.monotonic() + max_wait
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        if failure:
+            raise failure[0]
+    finally:
+        closed.set()
+
+_END = object()
+
+def _read_ahead(items, buffer, failure, closed):
+    try:
+        for item in items:
+            if not _offer(buffer, item, closed):
+                return
+    except Exception as e:
+        failure.append(e)
+    _offer(buffer, _END, closed)
+
+def _offer(buffer, item, closed):
+    """Put item, giving up once the consumer has gone (client disconnected)"""
+    while not closed.is_set():
+        try:
+            buffer.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _batched_by_size(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def score_stream(lines, score_batch, batch_size=256, max_wait=None):
+    """One NDJSON chunk per batch: score_batch(snapshots) -> predictions, in input order"""
+    for batch in batched(parse_lines(lines), batch_size, max_wait):
+        snapshots = [snapshot for _, snapshot, _ in batch if snapshot is not None]
+        predictions = iter(score_batch(snapshots) if snapshots else ())
+        chunk = []
+        for number, snapshot, error in batch:
+            result = next(predictions) if snapshot is not None else {'error': error, 'line': number}
+            chunk.append(json.dumps(result) + '\n')
+        yield ''.join(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an NDJSON file of snapshots offline")
+    parser.add_argument('input', help="NDJSON snapshots, one per line ('-' for stdin)")
+    parser.add_argument('--output', '-o', help="Write predictions here instead of stdout")
+    parser.add_argument('--batch-size', type=int, default=1024, help="Snapshots per inference call")
+    args = parser.parse_args()
+
+    # Same scoring path as the server; its startup log goes to stderr, not the predictions
+    with contextlib.redirect_stdout(sys.stderr):
+        import model_server
+    loaded = model_server.registry.current
+    if not loaded:
+        sys.exit("Model not loaded")
+
+    source = sys.stdin if args.input == '-' else open(args.input, 'r')
+    sink = open(args.output, 'w') if args.output else sys.stdout
+    started = time.perf_counter()
+    count = 0
+    # The file is one feed: rolling features carry over from line to line
+    stream = {}
+    try:
+        for chunk in score_stream(source, lambda snapshots: model_server.score_stream_batch(snapshots, stream),
+                                  args.batch_size):
+            sink.write(chunk)
+            count += chunk.count('\n')
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    elapsed = time.perf_counter() - started
+    print(f"Scored {count} lines in {elapsed:.2f}s ({count / max(elapsed, 1e-9):,.0f} lines/s) "
+          f"with model {loaded.version}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Prediction Cache - LRU/TTL cache keyed on quantized feature vectors
+Snapshots that only drift within a bucket share one cached incident probability
+(or, with a width, one cached vector such as an /explain contribution row)
+"""
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Bucket width per feature family, matched on the feature name suffix.
+# Features outside every family (hour_of_day, is_peak_hour, ...) are keyed exactly.
+DEFAULT_BUCKET_WIDTHS = {
+    'cpu': 1.0,
+    'memory': 1.0,
+    'latency': 10.0,
+    'availability': 0.1,
+    'error_rate': 0.1,
+    'throughput': 2.0,
+    'dependency_health_score': 0.5,
+    'cascade_risk': 0.05,
+    'slo_violation_count': 1.0,
+}
+
+def parse_bucket_widths(spec):
+    """Parse 'cpu=2,latency=25' into overrides on top of DEFAULT_BUCKET_WIDTHS"""
+    widths = dict(DEFAULT_BUCKET_WIDTHS)
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        family, width = item.split('=')
+        widths[family.strip()] = float(width)
+    return widths
+
+def feature_bucket_widths(feature_names, widths):
+    """Bucket width for each feature in order; 0 means exact match"""
+    resolved = []
+    for name in feature_names:
+        # Longest suffix wins so 'critical_path_latency' could be tuned apart from 'latency'
+        families = [family for family in widths if name == family or name.endswith('_' + family)]
+        resolved.append(widths[max(families, key=len)] if families else 0.0)
+    return np.array(resolved, dtype=np.float64)
+
+
+class PredictionCache:
+    """Bounded LRU of incident probabilities with a TTL and hit/miss counters
+
+    width=None stores one float per key; width=W stores a length-W vector.
+    """
+
+    def __init__(self, feature_names, max_size=10000, ttl=30.0, bucket_widths=None, width=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.width = width
+        self.widths = feature_bucket_widths(feature_names, bucket_widths or DEFAULT_BUCKET_WIDTHS)
+        self._quantized = self.widths > 0
+        self._safe_widths = np.where(self._quantized, self.widths, 1.0)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def keys_for(self, X):
+        """One hashable key per row of the (N, F) feature matrix"""
+        X = np.asarray(X, dtype=np.float64)
+        quantized = np.where(self._quantized, np.floor(X / self._safe_widths), X)
+        return [row.tobytes() for row in quantized]
+
+    def get_many(self, keys):
+        """Cached probabilities for keys, NaN where missing or expired ((N, width) with a width)"""
+        now = time.monotonic()
+        shape = len(keys) if self.width is None else (len(keys), self.width)
+        probs = np.full(shape, np.nan)
+        with self._lock:
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                elif entry[1] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    probs[i] = entry[0]
+                    self.hits += 1
+        return probs
+
+    def put_many(self, keys, probs):
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            for key, prob in zip(keys, probs):
+                self._entries[key] = (float(prob) if self.width is None else np.array(prob), expires_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+def combined_stats(stats, peers=()):
+    """stats() with other workers' added; peers are (stats, alive) pairs and only live workers' entries count towards size"""
+    combined = dict(stats)
+    for peer, alive in peers:
+        for key in ('hits', 'misses', 'expired'):
+            combined[key] += peer[key]
+        if alive:
+            combined['size'] += peer['size']
+    lookups = combined['hits'] + combined['misses']
+    combined['hit_rate'] = combined['hits'] / lookups if lookups else 0.0
+    return combined
@@ -0,0 +1,273 @@
+"""
+Prediction Log - Append-only capture of served predictions in fixed-width segments
+Each record is the ordered input feature vector, the incident probability,
+the model version and a timestamp, packed as one NumPy structured row. A
+segment is a page-sized JSON header (feature order, record layout) followed
+by records, so it reads back as a zero-copy np.memmap. Writes are a single
+append of the batch's bytes; segments rotate at a size limit, and every
+process writes its own, so forked workers never interleave records.
+
+Replays captured traffic against any model at full batch speed:
+
+    python prediction_log.py ../prediction_log --model-dir ../models
+"""
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+import numpy as np
+
+MAGIC = b'SREPLOG1'
+HEADER_SIZE = 4096
+SEGMENT_SUFFIX = '.plog'
+VERSION_WIDTH = 24
+
+def record_dtype(num_features):
+    return np.dtype([
+        ('timestamp', '<f8'),
+        ('probability', '<f4'),
+        ('model_version', f'S{VERSION_WIDTH}'),
+        ('features', '<f4', (num_features,)),
+    ])
+
+def segment_paths(log_dir):
+    """Segments oldest first (names start with the creation time in ns)"""
+    return sorted(glob.glob(os.path.join(log_dir, '*' + SEGMENT_SUFFIX)))
+
+def segment_pid(path):
+    """Pid of the process that wrote a segment (names are '<ns>-<pid>.plog')"""
+    return int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)].rsplit('-', 1)[1])
+
+def writer_running(pid):
+    """True if another process with this pid is alive and may still append to its segment"""
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE or not raw.startswith(MAGIC):
+        raise ValueError(f"{path} is not a prediction log segment")
+    return json.loads(raw[len(MAGIC):].rstrip(b'\0'))
+
+def read_segment(path):
+    """(header, records) with records a read-only memmap over every complete record"""
+    header = read_header(path)
+    dtype = record_dtype(len(header['features']))
+    # A record still being appended is not counted
+    count = (os.path.getsize(path) - HEADER_SIZE) // dtype.itemsize
+    if count <= 0:
+        return header, np.zeros(0, dtype=dtype)
+    return header, np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+def missing_features(header, feature_names):
+    """feature_names a segment did not capture (e.g. logged by a --compress model's subset)"""
+    captured = set(header['features'])
+    return [name for name in feature_names if name not in captured]
+
+def aligned_features(records, header, feature_names):
+    """A segment's feature matrix in feature_names order; ValueError if it lacks any of them
+
+    A missing column has no honest fill value: 0 reads as "service down"
+    for availability or throughput.
+    """
+    if header['features'] == list(feature_names):
+        return records['features']
+    missing = missing_features(header, feature_names)
+    if missing:
+        raise ValueError(f"The segment lacks {len(missing)} features ({', '.join(missing[:3])}...)")
+    position = {name: i for i, name in enumerate(header['features'])}
+    return records['features'][:, [position[name] for name in feature_names]]
+
+def readable_segments(log_dir, feature_names):
+    """(path, header, records) of the segments that captured every one of feature_names
+
+    Other segments are skipped with a message rather than zero-filled.
+    """
+    for path in segment_paths(log_dir):
+        header, records = read_segment(path)
+        missing = missing_features(header, feature_names)
+        if missing:
+            print(f"Skipping {path}: lacks {len(missing)} of the {len(feature_names)} features "
+                  f"({', '.join(missing[:3])}...)")
+            continue
+        yield path, header, records
+
+def load_log(log_dir, feature_names, max_rows=None, rng=None):
+    """(X, probabilities) of the segments in log_dir holding feature_names, optionally a uniform sample of max_rows"""
+    parts, probs = [], []
+    for _, header, records in readable_segments(log_dir, feature_names):
+        if len(records):
+            parts.append(aligned_features(records, header, feature_names))
+            probs.append(records['probability'])
+    if not parts:
+        return np.zeros((0, len(feature_names)), dtype=np.float32), np.zeros(0, dtype=np.float32)
+    sizes = [len(part) for part in parts]
+    if max_rows is not None and sum(sizes) > max_rows:
+        rng = rng if rng is not None else np.random.default_rng()
+        keep = np.sort(rng.choice(sum(sizes), size=max_rows, replace=False))
+        bounds = np.searchsorted(keep, np.cumsum([0] + sizes))
+        offsets = np.cumsum([0] + sizes)
+        # Gather per segment so only the sampled rows are read from the memmaps
+        rows = [keep[bounds[i]:bounds[i + 1]] - offsets[i] for i in range(len(parts))]
+        parts = [np.asarray(part[r]) for part, r in zip(parts, rows)]
+        probs = [np.asarray(prob[r]) for prob, r in zip(probs, rows)]
+    return np.concatenate(parts).astype(np.float32, copy=False), np.concatenate(probs)
+
+
+class PredictionLog:
+    """Appends (features, probability, version, timestamp) records to rotating segments
+
+    max_segment_bytes bounds one segment; max_segments > 0 deletes the
+    oldest segments in log_dir beyond that many, skipping segments whose
+    writer is still running (other workers may still be appending to them).
+    """
+
+    def __init__(self, log_dir, max_segment_bytes=64 * 1024 * 1024, max_segments=0):
+        self.log_dir = log_dir
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._fd = None
+        self._pid = None
+        self._features = None
+        self._dtype = None
+        self._size = 0
+        self.path = None
+        self.records = 0
+        self.bytes_written = 0
+        self.segments_opened = 0
+        os.makedirs(log_dir, exist_ok=True)
+
+    def append(self, feature_names, X, probabilities, model_version):
+        """Log the (N, features) rows scored with model_version; one write per call"""
+        X = np.asarray(X, dtype=np.float32)
+        if not len(X):
+            return
+        with self._lock:
+            if self._pid != os.getpid() or self._features != feature_names:
+                # Forked worker or new feature order: records must not share a segment
+                self._open_segment(feature_names)
+            records = np.empty(len(X), dtype=self._dtype)
+            records['timestamp'] = time.time()
+            records['probability'] = probabilities
+            records['model_version'] = model_version.encode()[:VERSION_WIDTH]
+            records['features'] = X
+            data = records.tobytes()
+            if self._size + len(data) > self.max_segment_bytes and self._size > HEADER_SIZE:
+                self._open_segment(feature_names)
+            os.write(self._fd, data)
+            self._size += len(data)
+            self.records += len(X)
+            self.bytes_written += len(data)
+
+    def _open_segment(self, feature_names):
+        if self._fd is not None and self._pid == os.getpid():
+            os.close(self._fd)
+        self._pid = os.getpid()
+        self._features = feature_names
+        self._dtype = record_dtype(len(feature_names))
+        header = MAGIC + json.dumps({
+            'format_version': 1,
+            'features': list(feature_names),
+            'record_size': self._dtype.itemsize,
+            'created_at': time.time(),
+            'pid': self._pid,
+        }).encode()
+        if len(header) > HEADER_SIZE:
+            raise ValueError(f"{len(feature_names)} feature names do not fit the {HEADER_SIZE}-byte header")
+        self.path = os.path.join(self.log_dir, f'{time.time_ns():020d}-{self._pid}{SEGMENT_SUFFIX}')
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        os.write(self._fd, header.ljust(HEADER_SIZE, b'\0'))
+        self._size = HEADER_SIZE
+        self.segments_opened += 1
+        if self.max_segments > 0:
+            self._prune()
+
+    def _prune(self):
+        # Our own closed segments go; a live worker's may be its open one, and
+        # unlinking it would silently lose everything it appends afterwards
+        paths = segment_paths(self.log_dir)
+        closed = [path for path in paths if path != self.path and not writer_running(segment_pid(path))]
+        for old in closed[:max(len(paths) - self.max_segments, 0)]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'log_dir': self.log_dir,
+                'segment': self.path,
+                'records': self.records,
+                'bytes_written': self.bytes_written,
+                'segments_opened': self.segments_opened,
+                'max_segment_bytes': self.max_segment_bytes,
+                'max_segments': self.max_segments,
+            }
+
+
+def replay(log_dir, loaded, batch_size=65536):
+    """Re-score every logged row with loaded; yields (header, records, new probabilities) per chunk"""
+    for _, header, records in readable_segments(log_dir, loaded.input_features):
+        for start in range(0, len(records), batch_size):
+            chunk = records[start:start + batch_size]
+            X = aligned_features(chunk, header, loaded.input_features)
+            # Logged rows were stateless requests: a --temporal model sees each as a fresh window
+            model_X = loaded.rolling.expand(X) if loaded.rolling is not None else X
+            yield header, chunk, loaded.model.predict_proba(model_X)[:, 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score captured traffic against a model")
+    parser.add_argument('log_dir', help="PREDICTION_LOG_DIR of the server that captured the traffic")
+    parser.add_argument('--model-dir', help="Model artifacts to replay against (default: the served models/)")
+    parser.add_argument('--engine', default='auto', choices=['auto', 'native', 'xgboost'])
+    parser.add_argument('--batch-size', type=int, default=65536, help="Rows per inference call")
+    parser.add_argument('--output', '-o', help="Save logged and replayed probabilities to this .npz")
+    args = parser.parse_args()
+
+    from model_registry import load_model
+    loaded = load_model(args.engine, args.model_dir)
+    print(f"Replaying {args.log_dir} against {loaded.version} ({loaded.engine})")
+
+    started = time.perf_counter()
+    per_version = {}
+    outputs = {'timestamp': [], 'model_version': [], 'logged': [], 'replayed': []}
+    for _, records, replayed in replay(args.log_dir, loaded, args.batch_size):
+        logged = records['probability'].astype(np.float64)
+        versions = records['model_version']
+        for version in np.unique(versions):
+            rows = versions == version
+            stats = per_version.setdefault(version.decode(), {'rows': 0, 'agreements': 0, 'abs_delta_sum': 0.0})
+            stats['rows'] += int(rows.sum())
+            stats['agreements'] += int(np.count_nonzero((logged[rows] > 0.5) == (replayed[rows] > 0.5)))
+            stats['abs_delta_sum'] += float(np.abs(replayed[rows] - logged[rows]).sum())
+        if args.output:
+            for key, values in (('timestamp', records['timestamp']), ('model_version', versions),
+                                ('logged', logged), ('replayed', replayed)):
+                outputs[key].append(np.asarray(values))
+    elapsed = time.perf_counter() - started
+
+    total = sum(stats['rows'] for stats in per_version.values())
+    print(f"Replayed {total} rows in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+    for version, stats in sorted(per_version.items()):
+        print(f"  logged by {version}: {stats['rows']} rows, agreement {stats['agreements'] / stats['rows']:.4f}, "
+              f"mean |delta| {stats['abs_delta_sum'] / stats['rows']:.4f}")
+    if args.output:
+        np.savez(args.output, **{key: np.concatenate(values) if values else np.zeros(0)
+                                 for key, values in outputs.items()})
+        print(f"Saved to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Rolling Features - Incremental temporal features over per-metric ring buffers
+Every service metric keeps an EWMA, a rate of change, a rolling max and a
+rolling p95 over the last `window` snapshots, so the model can tell a spike
+from a trend. Updates are amortized O(1) per snapshot: the window max and p95
+come from a block decomposition of the ring buffer (van Herk / Gil-Werman)
+that only keeps the top k values, so no update rescans the history.
+
+State is vectorized over independent streams: training steps thousands of
+synthetic series at once through the same update() the server runs on a
+single live feed, so both compute identical features.
+"""
+import math
+import numpy as np
+
+ROLLING_STATS = ('ewma', 'roc', 'max', 'p95')
+DEFAULT_CONFIG = {'window': 20, 'alpha': 0.3, 'roc_lag': 5, 'quantile': 0.95}
+
+def rolling_feature_names(metrics):
+    """Rolling feature columns, grouped per metric in ROLLING_STATS order"""
+    return [f'{metric}_{stat}' for metric in metrics for stat in ROLLING_STATS]
+
+def _top_k(values, k):
+    """Largest k values along the last axis, descending"""
+    return -np.sort(-values, axis=-1)[..., :k]
+
+
+class RollingState:
+    """Ring buffers of num_streams independent streams, each num_metrics wide"""
+
+    def __init__(self, num_streams, num_metrics, window=20, alpha=0.3, roc_lag=5, quantile=0.95):
+        if not 0 < roc_lag < window:
+            raise ValueError(f"roc_lag must be in (0, window), got {roc_lag} for window {window}")
+        self.window = window
+        self.alpha = alpha
+        self.roc_lag = roc_lag
+        self.quantile = quantile
+        # Nearest-rank p95 of a full window is the k-th largest value; the max is the first
+        self.k = window - math.ceil(quantile * window - 1e-9) + 1
+        shape = (num_streams, num_metrics)
+        self.ring = np.zeros(shape + (window,))
+        self.ewma = np.zeros(shape)
+        # Top k of the current block so far, and of each suffix of the previous block
+        self.prefix_top = np.full(shape + (self.k,), -np.inf)
+        self.suffix_top = np.full(shape + (window + 1, self.k), -np.inf)
+        self.count = 0
+
+    def update(self, values):
+        """Push one (num_streams, num_metrics) snapshot; returns (num_streams, 4 * num_metrics) features"""
+        values = np.asarray(values, dtype=np.float64)
+        t, window = self.count, self.window
+        position = t % window
+        if position == 0:
+            self.prefix_top.fill(-np.inf)
+
+        if t == 0:
+            self.ewma[:] = values
+            roc = np.zeros_like(values)
+        else:
+            self.ewma = self.alpha * values + (1 - self.alpha) * self.ewma
+            lag = min(self.roc_lag, t)
+            roc = (values - self.ring[..., (t - lag) % window]) / lag
+
+        self.ring[..., position] = values
+        self.prefix_top = _top_k(np.concatenate([self.prefix_top, values[..., None]], axis=-1), self.k)
+        # Window = previous block after this position + current block up to it
+        window_top = _top_k(np.concatenate([self.suffix_top[..., position + 1, :], self.prefix_top], axis=-1), self.k)
+        if position == window - 1:
+            # Block complete: its suffix maxima serve the next `window` updates
+            for p in range(window - 1, -1, -1):
+                self.suffix_top[..., p, :] = _top_k(
+                    np.concatenate([self.suffix_top[..., p + 1, :], self.ring[..., p, None]], axis=-1), self.k)
+        self.count += 1
+
+        filled = min(self.count, window)
+        p95 = window_top[..., filled - math.ceil(self.quantile * filled - 1e-9)]
+        return np.stack([self.ewma, roc, window_top[..., 0], p95], axis=-1).reshape(len(values), -1)
+
+    @staticmethod
+    def cold_features(values):
+        """What the first update() of a fresh state returns, without allocating its buffers"""
+        values = np.asarray(values, dtype=np.float64)
+        # Explicit width: -1 cannot be inferred for zero rows
+        stacked = np.stack([values, np.zeros_like(values), values, values], axis=-1)
+        return stacked.reshape(len(values), len(ROLLING_STATS) * values.shape[-1])
+
+
+class RollingFeatureSpec:
+    """A model's rolling-feature layout: the metrics feeding it and where its columns go"""
+
+    def __init__(self, feature_names, config):
+        self.config = dict(DEFAULT_CONFIG, **config)
+        self.metrics = list(self.config['metrics'])
+        self.columns = rolling_feature_names(self.metrics)
+        missing = sorted(set(self.columns) - set(feature_names))
+        if missing:
+            raise ValueError(f"The model lacks rolling features {missing[:3]}...")
+        rolling = set(self.columns)
+        # What clients send: the model's features minus the rolling ones
+        self.input_features = [name for name in feature_names if name not in rolling]
+        self.num_features = len(feature_names)
+        position = {name: i for i, name in enumerate(feature_names)}
+        self._input_positions = [position[name] for name in self.input_features]
+        self._rolling_positions = [position[name] for name in self.columns]
+        input_position = {name: i for i, name in enumerate(self.input_features)}
+        self._metric_columns = [input_position[metric] for metric in self.metrics]
+
+    def new_state(self, num_streams=1):
+        return RollingState(num_streams, len(self.metrics), self.config['window'], self.config['alpha'],
+                            self.config['roc_lag'], self.config['quantile'])
+
+    def expand(self, X, state=None):
+        """Model matrix from (N, input_features) rows
+
+        Without a state every row is its own stream seen for the first time
+        (what a stateless request gets); with a single-stream state the rows
+        are consecutive snapshots of that stream and update it in order.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        full = np.empty((len(X), self.num_features), dtype=np.float32)
+        full[:, self._input_positions] = X
+        metrics = X[:, self._metric_columns]
+        if state is None:
+            full[:, self._rolling_positions] = RollingState.cold_features(metrics)
+        else:
+            for i in range(len(X)):
+                full[i, self._rolling_positions] = state.update(metrics[i:i + 1])[0]
+        return full
+
+    def expand_series(self, series):
+        """(S, T, input_features) synthetic series -> (S * T, features), all S streams stepped together"""
+        num_series, length, _ = series.shape
+        state = self.new_state(num_series)
+        full = np.empty((num_series, length, self.num_features), dtype=np.float32)
+        full[..., self._input_positions] = series
+        for t in range(length):
+            full[:, t, self._rolling_positions] = state.update(series[:, t, self._metric_columns])
+        return full.reshape(num_series * length, self.num_features)
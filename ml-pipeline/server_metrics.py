@@ -0,0 +1,282 @@
+"""
+Server Metrics - Per-stage latency histograms and counters in Prometheus text format
+Disabled metrics hand out a shared no-op timer, so the request path pays nothing.
+Under gunicorn, WorkerStats shares each worker's state so any one of them can
+answer a scrape for all of them.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+# Seconds; covers microsecond cache hits up to slow batch requests
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds observations <= buckets[i] (last is +Inf)"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def state(self):
+        return {'counts': list(self.counts), 'sum': self.sum, 'count': self.count}
+
+    def merge(self, state):
+        """Add another histogram's state() (same buckets)"""
+        for i, count in enumerate(state['counts']):
+            self.counts[i] += count
+        self.sum += state['sum']
+        self.count += state['count']
+
+
+class StageTimer:
+    """Times consecutive stages of one request: each lap() closes the current stage"""
+    __slots__ = ('_metrics', '_endpoint', '_started', '_last')
+
+    def __init__(self, metrics, endpoint):
+        self._metrics = metrics
+        self._endpoint = endpoint
+        self._started = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self._metrics.observe(self._endpoint, stage, now - self._last)
+        self._last = now
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+NULL_TIMER = _NullTimer()
+
+
+class ServerMetrics:
+    """Request metrics for the model server, rendered on /metrics"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stages = defaultdict(Histogram)
+        self._requests = defaultdict(int)
+        self._predictions = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.in_flight = 0
+
+    def start_request(self, endpoint):
+        if not self.enabled:
+            return NULL_TIMER
+        with self._lock:
+            self.in_flight += 1
+            self._requests[endpoint] += 1
+        return StageTimer(self, endpoint)
+
+    def finish_request(self, timer):
+        if timer is NULL_TIMER:
+            return
+        self.observe(timer._endpoint, 'total', time.perf_counter() - timer._started)
+        with self._lock:
+            self.in_flight -= 1
+
+    def observe(self, endpoint, stage, seconds):
+        with self._lock:
+            self._stages[(endpoint, stage)].observe(seconds)
+
+    def observe_batch(self, size, queue_waits):
+        """One micro-batch: its size and how long each row waited in the queue"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._batch_sizes.observe(size)
+            wait_histogram = self._stages[('micro_batch', 'queue_wait')]
+            for seconds in queue_waits:
+                wait_histogram.observe(seconds)
+
+    def count_predictions(self, endpoint, predictions):
+        if not self.enabled:
+            return
+        with self._lock:
+            for prediction in predictions:
+                self._predictions[(endpoint, prediction['risk_level'])] += 1
+
+    def count_error(self, endpoint, error_type):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._errors[(endpoint, error_type)] += 1
+
+    def state(self):
+        """JSON-serialisable copy of the counters and histograms, published by WorkerStats"""
+        with self._lock:
+            return {
+                'stages': [[endpoint, stage, histogram.state()]
+                           for (endpoint, stage), histogram in self._stages.items()],
+                'batch_sizes': self._batch_sizes.state(),
+                'requests': [[endpoint, count] for endpoint, count in self._requests.items()],
+                'predictions': [[endpoint, risk_level, count]
+                                for (endpoint, risk_level), count in self._predictions.items()],
+                'errors': [[endpoint, error_type, count] for (endpoint, error_type), count in self._errors.items()],
+                'in_flight': self.in_flight,
+            }
+
+    def _merge(self, state, live=True):
+        for endpoint, stage, histogram in state['stages']:
+            self._stages[(endpoint, stage)].merge(histogram)
+        self._batch_sizes.merge(state['batch_sizes'])
+        for endpoint, count in state['requests']:
+            self._requests[endpoint] += count
+        for endpoint, risk_level, count in state['predictions']:
+            self._predictions[(endpoint, risk_level)] += count
+        for endpoint, error_type, count in state['errors']:
+            self._errors[(endpoint, error_type)] += count
+        if live:
+            self.in_flight += state['in_flight']
+
+    def render(self, extra=(), peers=()):
+        """Prometheus text exposition; extra is an iterable of (name, type, help, labels, value)
+
+        peers are the other workers' WorkerStats snapshots: their histograms
+        and counters (also counter-typed extra) are added to this worker's,
+        and the gauges of live workers are exported next to its own, so
+        gauge labels must tell the workers apart.
+        """
+        source = self
+        if peers:
+            source = ServerMetrics()
+            source._merge(self.state())
+            for peer in peers:
+                source._merge(peer['metrics'], peer['alive'])
+        lines = source._lines()
+
+        families = {}
+        for worker_extra, live in [(extra, True)] + [(peer['extra'], peer['alive']) for peer in peers]:
+            for name, metric_type, help_text, labels, value in worker_extra:
+                if metric_type != 'counter' and not live:
+                    continue
+                family = families.setdefault(name, (metric_type, help_text, {}))[2]
+                key = tuple(labels.items())
+                family[key] = family[key] + value if metric_type == 'counter' and key in family else value
+        for name, (metric_type, help_text, series) in families.items():
+            lines += _header(name, metric_type, help_text)
+            for key, value in series.items():
+                label_text = ','.join(f'{label}="{val}"' for label, val in key)
+                lines.append(f'{name}{{{label_text}}} {value!r}' if label_text else f'{name} {value!r}')
+        return '\n'.join(lines) + '\n'
+
+    def _lines(self):
+        lines = []
+        with self._lock:
+            lines += _header('model_server_stage_seconds', 'histogram', 'Latency per request stage in seconds')
+            for (endpoint, stage), histogram in sorted(self._stages.items()):
+                lines += _histogram_lines('model_server_stage_seconds', f'endpoint="{endpoint}",stage="{stage}"', histogram)
+
+            if self._batch_sizes.count:
+                lines += _header('model_server_micro_batch_size', 'histogram', 'Rows per micro-batch inference call')
+                lines += _histogram_lines('model_server_micro_batch_size', '', self._batch_sizes)
+
+            lines += _header('model_server_requests_total', 'counter', 'Requests received per endpoint')
+            for endpoint, count in sorted(self._requests.items()):
+                lines.append(f'model_server_requests_total{{endpoint="{endpoint}"}} {count}')
+
+            lines += _header('model_server_predictions_total', 'counter', 'Predictions served per risk level')
+            for (endpoint, risk_level), count in sorted(self._predictions.items()):
+                lines.append(f'model_server_predictions_total{{endpoint="{endpoint}",risk_level="{risk_level}"}} {count}')
+
+            lines += _header('model_server_errors_total', 'counter', 'Failed requests per error type')
+            for (endpoint, error_type), count in sorted(self._errors.items()):
+                lines.append(f'model_server_errors_total{{endpoint="{endpoint}",error="{error_type}"}} {count}')
+
+            lines += _header('model_server_in_flight_requests', 'gauge', 'Requests currently being served')
+            lines.append(f'model_server_in_flight_requests {self.in_flight}')
+        return lines
+
+
+class WorkerStats:
+    """Each worker's state in <directory>/<pid>.json, so whichever worker takes a request can answer for all
+
+    gunicorn workers share nothing after the fork and a scrape lands on an
+    arbitrary one. start() publishes collect() every `interval` seconds;
+    peers() reads the other workers' latest files. Files of exited workers
+    stay so their counters never go backwards.
+    """
+
+    def __init__(self, directory, collect, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self._collect = collect
+
+    def publish(self):
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self._collect(), f)
+        # Readers see the previous file or this one, never a partial write
+        os.replace(path + '.tmp', path)
+
+    def start(self):
+        def publish_forever():
+            while True:
+                try:
+                    self.publish()
+                except Exception as e:
+                    print(f"Warning: Could not publish worker stats to {self.directory}: {e}")
+                time.sleep(self.interval)
+
+        threading.Thread(target=publish_forever, name='worker-stats', daemon=True).start()
+
+    def peers(self):
+        """The other workers' latest states, each with its pid and whether that worker is still alive"""
+        own = os.getpid()
+        states = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == f'{own}.json':
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            state['pid'] = int(name[:-len('.json')])
+            state['alive'] = _process_alive(state['pid'])
+            states.append(state)
+        return states
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _histogram_lines(name, labels, histogram):
+    prefix = labels + ',' if labels else ''
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+    suffix = f'{{{labels}}}' if labels else ''
+    lines.append(f'{name}_sum{suffix} {histogram.sum!r}')
+    lines.append(f'{name}_count{suffix} {histogram.count}')
+    return lines
+
+def _header(name, metric_type, help_text):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
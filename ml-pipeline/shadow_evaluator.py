@@ -0,0 +1,207 @@
+"""
+Shadow Evaluator - Scores a candidate model on live traffic off the request path
+Request threads hand each scored batch (input rows plus the primary model's
+probabilities) to a bounded queue and return immediately; background workers
+score it with the candidate and record how the two models compare. When the
+queue is full the sample is dropped and counted, so a slow or overloaded
+candidate never adds latency to the primary's responses. A candidate that
+needs inputs the primary does not use (a full model behind a --compress
+primary) is not compared: its missing columns have no honest value.
+"""
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+import numpy as np
+
+# Upper edges of the |candidate - primary| probability histogram
+DELTA_BUCKETS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+# Comparisons kept per (primary, candidate) version pair; older pairs are forgotten
+MAX_COMPARISONS = 8
+
+def align_columns(X, feature_names, target_names):
+    """X's columns reordered to target_names, which must all be among feature_names"""
+    position = {name: i for i, name in enumerate(feature_names)}
+    return X[:, [position[name] for name in target_names]]
+
+
+class ShadowComparison:
+    """Agreement, probability deltas and risk-level flips of one primary/candidate pair"""
+
+    def __init__(self, primary_version, candidate_version):
+        self.primary_version = primary_version
+        self.candidate_version = candidate_version
+        self.rows = 0
+        self.agreements = 0
+        self.risk_flips = Counter()
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.delta_counts = np.zeros(len(DELTA_BUCKETS), dtype=np.int64)
+        self.candidate_seconds = 0.0
+
+    def record(self, primary_probs, candidate_probs, primary_levels, candidate_levels, seconds):
+        delta = candidate_probs - primary_probs
+        abs_delta = np.abs(delta)
+        self.rows += len(delta)
+        self.agreements += int(np.count_nonzero((primary_probs > 0.5) == (candidate_probs > 0.5)))
+        self.risk_flips.update((a, b) for a, b in zip(primary_levels, candidate_levels) if a != b)
+        self.delta_sum += float(delta.sum())
+        self.abs_delta_sum += float(abs_delta.sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(abs_delta.max()))
+        buckets = np.minimum(np.searchsorted(DELTA_BUCKETS, abs_delta), len(DELTA_BUCKETS) - 1)
+        self.delta_counts += np.bincount(buckets, minlength=len(DELTA_BUCKETS))
+        self.candidate_seconds += seconds
+
+    def summary(self):
+        rows = max(self.rows, 1)
+        flips = sum(self.risk_flips.values())
+        return {
+            'primary_version': self.primary_version,
+            'candidate_version': self.candidate_version,
+            'rows': self.rows,
+            'agreement_rate': self.agreements / rows if self.rows else None,
+            'risk_flip_rate': flips / rows if self.rows else None,
+            'risk_flips': {f'{a}->{b}': count for (a, b), count in self.risk_flips.most_common()},
+            'mean_delta': self.delta_sum / rows,
+            'mean_abs_delta': self.abs_delta_sum / rows,
+            'max_abs_delta': self.max_abs_delta,
+            'abs_delta_buckets': {f'le_{edge:g}': int(count) for edge, count in zip(DELTA_BUCKETS, self.delta_counts)},
+            'candidate_seconds_per_row': self.candidate_seconds / rows,
+        }
+
+
+class ShadowEvaluator:
+    """Bounded queue plus worker threads scoring candidate_registry.current against the primary"""
+
+    def __init__(self, candidate_registry, risk_level, max_queue_size=256, workers=1, sample_rate=1.0,
+                 max_batch_rows=1024):
+        self.registry = candidate_registry
+        self.risk_level = risk_level
+        self.max_queue_size = max_queue_size
+        self.num_workers = workers
+        self.sample_rate = sample_rate
+        self.max_batch_rows = max_batch_rows
+        self._rng = np.random.default_rng()
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+        self._comparisons = OrderedDict()
+        self.submitted = 0
+        self.dropped = 0
+        self.skipped = 0
+        self.schema_mismatch = 0
+        self.last_schema_mismatch = None
+        self.errors = 0
+        self.last_error = None
+
+    def submit(self, primary, X, primary_probs):
+        """Offer one scored batch: primary is its LoadedModel, X its (N, input_features) rows
+
+        Never blocks; returns False when the sample was dropped.
+        """
+        if self.sample_rate < 1.0 and self._rng.random() >= self.sample_rate:
+            return False
+        self._ensure_started()
+        item = (primary.version, primary.input_features, X, np.asarray(primary_probs, dtype=np.float64))
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    @property
+    def queue_size(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_started(self):
+        # Started lazily so each forked gunicorn worker gets its own queue and threads
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue_size)
+            for i in range(self.num_workers):
+                threading.Thread(target=self._run, args=(self._queue,), name=f'shadow-{i}', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self, work):
+        while True:
+            items = [work.get()]
+            rows = len(items[0][2])
+            # Score whatever else is already waiting in the same candidate call
+            while rows < self.max_batch_rows:
+                try:
+                    items.append(work.get_nowait())
+                except queue.Empty:
+                    break
+                rows += len(items[-1][2])
+            try:
+                self._evaluate(items)
+            except Exception as e:
+                with self._lock:
+                    self.errors += len(items)
+                    self.last_error = str(e)
+
+    def _evaluate(self, items):
+        candidate = self.registry.current
+        if candidate is None:
+            with self._lock:
+                self.skipped += len(items)
+            return
+        # Normally one group; a primary reload can split the queued samples across versions
+        groups = {}
+        for item in items:
+            groups.setdefault((item[0], id(item[1])), []).append(item)
+        for (primary_version, _), group in groups.items():
+            feature_names = group[0][1]
+            available = set(feature_names)
+            missing = [name for name in candidate.input_features if name not in available]
+            if missing:
+                with self._lock:
+                    self.schema_mismatch += len(group)
+                    self.last_schema_mismatch = (f"{candidate.version} needs {len(missing)} features "
+                                                 f"{primary_version} does not use ({', '.join(missing[:3])}...)")
+                continue
+            X = align_columns(np.concatenate([item[2] for item in group]), feature_names, candidate.input_features)
+            primary_probs = np.concatenate([item[3] for item in group])
+            started = time.perf_counter()
+            # Rows are scored statelessly: a --temporal candidate sees each as a fresh window
+            model_X = candidate.rolling.expand(X) if candidate.rolling is not None else X
+            candidate_probs = candidate.model.predict_proba(model_X)[:, 1].astype(np.float64)
+            seconds = time.perf_counter() - started
+            primary_levels = [self.risk_level(prob) for prob in primary_probs]
+            candidate_levels = [self.risk_level(prob) for prob in candidate_probs]
+            with self._lock:
+                key = (primary_version, candidate.version)
+                comparison = self._comparisons.get(key)
+                if comparison is None:
+                    comparison = self._comparisons[key] = ShadowComparison(*key)
+                    while len(self._comparisons) > MAX_COMPARISONS:
+                        self._comparisons.popitem(last=False)
+                comparison.record(primary_probs, candidate_probs, primary_levels, candidate_levels, seconds)
+
+    def stats(self):
+        with self._lock:
+            comparisons = [comparison.summary() for comparison in reversed(self._comparisons.values())]
+            return {
+                'candidate_version': self.registry.version,
+                'queue_size': self.queue_size,
+                'max_queue_size': self.max_queue_size,
+                'workers': self.num_workers,
+                'sample_rate': self.sample_rate,
+                'submitted': self.submitted,
+                'dropped': self.dropped,
+                'skipped': self.skipped,
+                'schema_mismatch': self.schema_mismatch,
+                'last_schema_mismatch': self.last_schema_mismatch,
+                'errors': self.errors,
+                'last_error': self.last_error,
+                'comparisons': comparisons,
+            }
@@ -0,0 +1,66 @@
+"""
+Tree Engine tests - TreeEnsemble must score exactly like XGBClassifier.predict_proba
+
+    python -m pytest test_tree_engine.py
+"""
+import numpy as np
+import pytest
+import xgboost as xgb
+from tree_engine import TreeEnsemble, export_trees, flatten_booster, serving_booster
+
+NUM_FEATURES = 6
+
+def make_data(num_rows, seed, missing_rate=0.2):
+    """Labels driven by a few features; missing values in every column so splits learn both default directions"""
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(num_rows, NUM_FEATURES)).astype(np.float32)
+    y = (X[:, 0] + 0.5 * X[:, 1] * X[:, 2] + rng.normal(scale=0.5, size=num_rows) > 0).astype(np.int8)
+    X[rng.random(X.shape) < missing_rate] = np.nan
+    return X, y
+
+@pytest.fixture(scope='module')
+def model():
+    X, y = make_data(2000, seed=0)
+    return xgb.XGBClassifier(n_estimators=30, max_depth=4, learning_rate=0.3, n_jobs=1).fit(X, y)
+
+@pytest.fixture(scope='module')
+def early_stopped_model():
+    X, y = make_data(2000, seed=1)
+    X_valid, y_valid = make_data(500, seed=2)
+    model = xgb.XGBClassifier(n_estimators=300, max_depth=6, learning_rate=0.5, n_jobs=1,
+                              early_stopping_rounds=5, eval_metric='logloss')
+    return model.fit(X, y, eval_set=[(X_valid, y_valid)], verbose=False)
+
+
+def test_parity_with_missing_values(model):
+    arrays = flatten_booster(serving_booster(model))
+    splits = arrays['left'] != np.arange(len(arrays['left']))
+    # Both default directions must be exercised for the NaN routing to be tested
+    assert arrays['default_left'][splits].any() and not arrays['default_left'][splits].all()
+
+    X, _ = make_data(1000, seed=3, missing_rate=0.3)
+    engine = TreeEnsemble(arrays)
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+def test_parity_all_missing_row(model):
+    X = np.full((1, NUM_FEATURES), np.nan, dtype=np.float32)
+    engine = TreeEnsemble(flatten_booster(serving_booster(model)))
+    np.testing.assert_allclose(engine.predict_proba(X), model.predict_proba(X), atol=1e-6)
+
+def test_empty_batch(model):
+    engine = TreeEnsemble(flatten_booster(serving_booster(model)))
+    probs = engine.predict_proba(np.zeros((0, NUM_FEATURES), dtype=np.float32))
+    assert probs.shape == (0, 2)
+
+def test_early_stopped_model_exports_best_iteration(early_stopped_model, tmp_path):
+    best_iteration = early_stopped_model.best_iteration
+    assert best_iteration < early_stopped_model.n_estimators - 1, "the fixture should stop early"
+
+    path = tmp_path / 'model_trees.npz'
+    export_trees(early_stopped_model, path, source_checksum='abc')
+    engine = TreeEnsemble.load(path)
+    assert engine.num_trees == best_iteration + 1
+    assert engine.source_checksum == 'abc'
+
+    X, _ = make_data(1000, seed=4)
+    np.testing.assert_allclose(engine.predict_proba(X), early_stopped_model.predict_proba(X), atol=1e-6)
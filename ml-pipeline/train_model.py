@@ -3,358 +3,342 @@ SRE AI Dashboard - ML Training Pipeline V2
 Includes extreme failure scenarios and cascade failures
 """
 
+import os
+import hashlib
+import io
+import itertools
+import json
+import multiprocessing
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
 import numpy as np
 import pandas as pd
 import pickle
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
 import xgboost as xgb
+import tree_engine
+from drift_monitor import reference_histograms
+from model_registry import available_cores
+from prediction_log import load_log
+from rolling_features import DEFAULT_CONFIG as ROLLING_DEFAULTS, RollingFeatureSpec, rolling_feature_names
 import warnings
 warnings.filterwarnings('ignore')
 
-print("="*60)
-print("SRE AI Dashboard - Training Pipeline V2")
-print("Now with cascade failures and extreme scenarios!")
-print("="*60)
-
 # Configuration
 SERVICES = ['api-gateway', 'auth-service', 'user-service', 'database']
+SERVICE_PREFIXES = [service.replace('-', '_') for service in SERVICES]
+SERVICE_METRICS = ['cpu', 'memory', 'latency', 'availability', 'error_rate', 'throughput']
+
+# Shared XGBoost configuration for in-memory and out-of-core training
+MODEL_PARAMS = dict(
+    n_estimators=150,
+    max_depth=8,
+    learning_rate=0.1,
+    objective='binary:logistic',
+    random_state=42,
+    eval_metric='logloss',
+    tree_method='hist',
+    scale_pos_weight=1,  # Balanced for incident detection
+    subsample=0.8,
+    colsample_bytree=0.8
+)
+
+# Fixed column order - matches models/features.txt
+FEATURE_COLUMNS = (
+    ['hour_of_day', 'is_peak_hour', 'is_weekend']
+    + [f'{prefix}_{metric}' for prefix in SERVICE_PREFIXES for metric in SERVICE_METRICS]
+    + ['dependency_health_score', 'cascade_risk', 'slo_violation_count', 'critical_path_latency']
+)
+COLUMN_INDEX = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+# --temporal: EWMA, rate of change, rolling max and p95 per service metric, appended after FEATURE_COLUMNS
+ROLLING_METRICS = [f'{prefix}_{metric}' for prefix in SERVICE_PREFIXES for metric in SERVICE_METRICS]
+ROLLING_CONFIG = dict(ROLLING_DEFAULTS, metrics=ROLLING_METRICS)
+TEMPORAL_FEATURE_COLUMNS = FEATURE_COLUMNS + rolling_feature_names(ROLLING_METRICS)
+
+# Per-service metric profiles: (low, high) is drawn uniformly, a scalar is fixed
+HEALTHY = {'cpu': (20, 70), 'memory': (30, 65), 'latency': (100, 400),
+           'availability': (98, 100), 'error_rate': (0, 2), 'throughput': (80, 150)}
+DEGRADED = {'cpu': (75, 95), 'memory': (70, 90), 'latency': (500, 1500),
+            'availability': (85, 95), 'error_rate': (5, 15), 'throughput': (40, 80)}
+SLIGHTLY_AFFECTED = {'cpu': (40, 75), 'memory': (40, 70), 'latency': (200, 600),
+                     'availability': (95, 99), 'error_rate': (1, 5), 'throughput': (70, 120)}
+STRESSED = {'cpu': (70, 90), 'memory': (65, 85), 'latency': (500, 1200),
+            'availability': (80, 95), 'error_rate': (5, 20), 'throughput': (40, 80)}
+DOWN = {'cpu': (20, 40), 'memory': (30, 50), 'latency': 2000,
+        'availability': 0, 'error_rate': 100, 'throughput': 0}
+
+def _new_block(num_samples, rng):
+    """Allocate a scenario block and fill the temporal features"""
+    X = np.empty((num_samples, len(FEATURE_COLUMNS)), dtype=np.float32, order='F')
+    X[:, COLUMN_INDEX['hour_of_day']] = rng.integers(0, 24, num_samples)
+    X[:, COLUMN_INDEX['is_peak_hour']] = rng.integers(0, 2, num_samples)
+    X[:, COLUMN_INDEX['is_weekend']] = rng.integers(0, 2, num_samples)
+    return X
+
+def _fill(X, column, value, rng, mask=None):
+    """Fill one column (optionally only the masked rows) with a fixed value or a uniform draw"""
+    rows = slice(None) if mask is None else mask
+    if isinstance(value, tuple):
+        count = len(X) if mask is None else int(np.count_nonzero(mask))
+        low, high = value
+        X[rows, COLUMN_INDEX[column]] = low + (high - low) * rng.random(count, dtype=np.float32)
+    else:
+        X[rows, COLUMN_INDEX[column]] = value
+
+def _fill_service(X, prefix, profile, rng, mask=None):
+    """Fill all metrics of one service from a profile"""
+    for metric in SERVICE_METRICS:
+        _fill(X, f'{prefix}_{metric}', profile[metric], rng, mask)
 
-def generate_normal_operations(num_samples=3000):
+def _fill_topology(X, rng, dependency_health, cascade_risk, slo_violations, critical_path_latency):
+    """Fill the topology features; slo_violations is an integer [low, high) range"""
+    _fill(X, 'dependency_health_score', dependency_health, rng)
+    _fill(X, 'cascade_risk', cascade_risk, rng)
+    X[:, COLUMN_INDEX['slo_violation_count']] = rng.integers(slo_violations[0], slo_violations[1], len(X))
+    _fill(X, 'critical_path_latency', critical_path_latency, rng)
+
+def generate_normal_operations(num_samples=3000, rng=None):
     """Generate normal operational data"""
-    data = []
+    rng = rng if rng is not None else np.random.default_rng()
+    X = _new_block(num_samples, rng)
     
-    for i in range(num_samples):
-        row = {
-            'hour_of_day': np.random.randint(0, 24),
-            'is_peak_hour': np.random.randint(0, 2),
-            'is_weekend': np.random.randint(0, 2),
-        }
-        
-        # Normal operations - all services healthy
-        for service in SERVICES:
-            feature_prefix = service.replace('-', '_')
-            row[f'{feature_prefix}_cpu'] = np.random.uniform(20, 70)
-            row[f'{feature_prefix}_memory'] = np.random.uniform(30, 65)
-            row[f'{feature_prefix}_latency'] = np.random.uniform(100, 400)
-            row[f'{feature_prefix}_availability'] = np.random.uniform(98, 100)
-            row[f'{feature_prefix}_error_rate'] = np.random.uniform(0, 2)
-            row[f'{feature_prefix}_throughput'] = np.random.uniform(80, 150)
-        
-        # Topology features
-        row['dependency_health_score'] = np.random.uniform(95, 100)
-        row['cascade_risk'] = np.random.uniform(0, 0.2)
-        row['slo_violation_count'] = np.random.randint(0, 2)
-        row['critical_path_latency'] = np.random.uniform(100, 500)
-        
-        # No incident in normal operations
-        row['will_have_incident'] = 0
-        
-        data.append(row)
-    
-    return data
-
-def generate_degraded_scenarios(num_samples=2000):
-    """Generate degraded but not critical scenarios"""
-    data = []
+    # Normal operations - all services healthy
+    for prefix in SERVICE_PREFIXES:
+        _fill_service(X, prefix, HEALTHY, rng)
     
-    for i in range(num_samples):
-        row = {
-            'hour_of_day': np.random.randint(0, 24),
-            'is_peak_hour': np.random.randint(0, 2),
-            'is_weekend': np.random.randint(0, 2),
-        }
-        
-        # Pick a service to degrade
-        degraded_service = np.random.choice(SERVICES)
-        
-        for service in SERVICES:
-            feature_prefix = service.replace('-', '_')
-            
-            if service == degraded_service:
-                # Degraded service
-                row[f'{feature_prefix}_cpu'] = np.random.uniform(75, 95)
-                row[f'{feature_prefix}_memory'] = np.random.uniform(70, 90)
-                row[f'{feature_prefix}_latency'] = np.random.uniform(500, 1500)
-                row[f'{feature_prefix}_availability'] = np.random.uniform(85, 95)
-                row[f'{feature_prefix}_error_rate'] = np.random.uniform(5, 15)
-                row[f'{feature_prefix}_throughput'] = np.random.uniform(40, 80)
-            else:
-                # Other services slightly affected
-                row[f'{feature_prefix}_cpu'] = np.random.uniform(40, 75)
-                row[f'{feature_prefix}_memory'] = np.random.uniform(40, 70)
-                row[f'{feature_prefix}_latency'] = np.random.uniform(200, 600)
-                row[f'{feature_prefix}_availability'] = np.random.uniform(95, 99)
-                row[f'{feature_prefix}_error_rate'] = np.random.uniform(1, 5)
-                row[f'{feature_prefix}_throughput'] = np.random.uniform(70, 120)
-        
-        # Topology features
-        row['dependency_health_score'] = np.random.uniform(70, 90)
-        row['cascade_risk'] = np.random.uniform(0.3, 0.6)
-        row['slo_violation_count'] = np.random.randint(2, 8)
-        row['critical_path_latency'] = np.random.uniform(500, 1500)
-        
-        # Medium risk of incident
-        row['will_have_incident'] = 1 if np.random.random() > 0.5 else 0
-        
-        data.append(row)
-    
-    return data
-
-def generate_cascade_failures(num_samples=2500):
-    """Generate complete cascade failure scenarios - CRITICAL for training!"""
-    data = []
+    _fill_topology(X, rng, (95, 100), (0, 0.2), (0, 2), (100, 500))
     
-    for i in range(num_samples):
-        row = {
-            'hour_of_day': np.random.randint(0, 24),
-            'is_peak_hour': np.random.randint(0, 2),
-            'is_weekend': np.random.randint(0, 2),
-        }
-        
-        # Scenario type
-        scenario = np.random.choice(['database_down', 'partial_cascade', 'complete_failure'])
-        
-        if scenario == 'database_down':
-            # Database completely down
-            row['database_cpu'] = np.random.uniform(30, 50)
-            row['database_memory'] = np.random.uniform(35, 55)
-            row['database_latency'] = np.random.uniform(1000, 2000)
-            row['database_availability'] = np.random.uniform(0, 60)  # Can be 0!
-            row['database_error_rate'] = np.random.uniform(40, 100)  # Can be 100!
-            row['database_throughput'] = np.random.uniform(0, 50)
-            
-            # Auth and User services fail due to database
-            for service in ['auth_service', 'user_service']:
-                row[f'{service}_cpu'] = np.random.uniform(20, 40)
-                row[f'{service}_memory'] = np.random.uniform(30, 50)
-                row[f'{service}_latency'] = 2000  # Max latency
-                row[f'{service}_availability'] = 0  # Completely down
-                row[f'{service}_error_rate'] = 100  # Total failure
-                row[f'{service}_throughput'] = 0
-            
-            # API Gateway fails due to dependencies
-            row['api_gateway_cpu'] = np.random.uniform(35, 50)
-            row['api_gateway_memory'] = np.random.uniform(40, 55)
-            row['api_gateway_latency'] = 2000
-            row['api_gateway_availability'] = 0
-            row['api_gateway_error_rate'] = 100
-            row['api_gateway_throughput'] = 0
-            
-        elif scenario == 'partial_cascade':
-            # Database degraded, some services down
-            row['database_cpu'] = np.random.uniform(80, 95)
-            row['database_memory'] = np.random.uniform(75, 90)
-            row['database_latency'] = np.random.uniform(800, 1500)
-            row['database_availability'] = np.random.uniform(70, 85)
-            row['database_error_rate'] = np.random.uniform(10, 30)
-            row['database_throughput'] = np.random.uniform(30, 70)
-            
-            # One service down, one degraded
-            auth_down = np.random.random() > 0.5
-            
-            if auth_down:
-                row['auth_service_cpu'] = np.random.uniform(20, 40)
-                row['auth_service_memory'] = np.random.uniform(30, 50)
-                row['auth_service_latency'] = 2000
-                row['auth_service_availability'] = 0
-                row['auth_service_error_rate'] = 100
-                row['auth_service_throughput'] = 0
-                
-                row['user_service_cpu'] = np.random.uniform(70, 90)
-                row['user_service_memory'] = np.random.uniform(65, 85)
-                row['user_service_latency'] = np.random.uniform(500, 1200)
-                row['user_service_availability'] = np.random.uniform(80, 95)
-                row['user_service_error_rate'] = np.random.uniform(5, 20)
-                row['user_service_throughput'] = np.random.uniform(40, 80)
-            else:
-                row['user_service_cpu'] = np.random.uniform(20, 40)
-                row['user_service_memory'] = np.random.uniform(30, 50)
-                row['user_service_latency'] = 2000
-                row['user_service_availability'] = 0
-                row['user_service_error_rate'] = 100
-                row['user_service_throughput'] = 0
-                
-                row['auth_service_cpu'] = np.random.uniform(70, 90)
-                row['auth_service_memory'] = np.random.uniform(65, 85)
-                row['auth_service_latency'] = np.random.uniform(500, 1200)
-                row['auth_service_availability'] = np.random.uniform(80, 95)
-                row['auth_service_error_rate'] = np.random.uniform(5, 20)
-                row['auth_service_throughput'] = np.random.uniform(40, 80)
-            
-            # API Gateway severely degraded
-            row['api_gateway_cpu'] = np.random.uniform(80, 95)
-            row['api_gateway_memory'] = np.random.uniform(75, 90)
-            row['api_gateway_latency'] = np.random.uniform(1000, 2000)
-            row['api_gateway_availability'] = np.random.uniform(50, 80)
-            row['api_gateway_error_rate'] = np.random.uniform(30, 70)
-            row['api_gateway_throughput'] = np.random.uniform(10, 50)
-            
-        else:  # complete_failure
-            # Everything is down
-            for service in SERVICES:
-                feature_prefix = service.replace('-', '_')
-                row[f'{feature_prefix}_cpu'] = np.random.uniform(10, 40)
-                row[f'{feature_prefix}_memory'] = np.random.uniform(20, 50)
-                row[f'{feature_prefix}_latency'] = 2000
-                row[f'{feature_prefix}_availability'] = 0
-                row[f'{feature_prefix}_error_rate'] = 100
-                row[f'{feature_prefix}_throughput'] = 0
-        
-        # Extreme topology features for cascade scenarios
-        row['dependency_health_score'] = np.random.uniform(0, 30)  # Very low
-        row['cascade_risk'] = np.random.uniform(0.6, 1.0)  # High risk
-        row['slo_violation_count'] = np.random.randint(12, 16)  # Many violations
-        row['critical_path_latency'] = 2000  # Maximum
-        
-        # ALWAYS an incident in cascade scenarios
-        row['will_have_incident'] = 1
-        
-        data.append(row)
-    
-    return data
-
-def generate_near_failure_scenarios(num_samples=2000):
-    """Generate scenarios right before cascade failure"""
-    data = []
+    # No incident in normal operations
+    y = np.zeros(num_samples, dtype=np.int8)
+    return X, y
+
+def generate_degraded_scenarios(num_samples=2000, rng=None):
+    """Generate degraded but not critical scenarios"""
+    rng = rng if rng is not None else np.random.default_rng()
+    X = _new_block(num_samples, rng)
     
-    for i in range(num_samples):
-        row = {
-            'hour_of_day': np.random.randint(0, 24),
-            'is_peak_hour': np.random.randint(0, 2),
-            'is_weekend': np.random.randint(0, 2),
-        }
-        
-        # Database under extreme stress but not down yet
-        row['database_cpu'] = np.random.uniform(85, 98)
-        row['database_memory'] = np.random.uniform(85, 95)
-        row['database_latency'] = np.random.uniform(800, 1800)
-        row['database_availability'] = np.random.uniform(75, 90)
-        row['database_error_rate'] = np.random.uniform(8, 25)
-        row['database_throughput'] = np.random.uniform(40, 70)
-        
-        # Other services showing stress
-        for service in ['auth_service', 'user_service']:
-            row[f'{service}_cpu'] = np.random.uniform(70, 90)
-            row[f'{service}_memory'] = np.random.uniform(65, 85)
-            row[f'{service}_latency'] = np.random.uniform(400, 1200)
-            row[f'{service}_availability'] = np.random.uniform(90, 97)
-            row[f'{service}_error_rate'] = np.random.uniform(3, 10)
-            row[f'{service}_throughput'] = np.random.uniform(60, 90)
-        
-        # API Gateway struggling
-        row['api_gateway_cpu'] = np.random.uniform(75, 92)
-        row['api_gateway_memory'] = np.random.uniform(70, 88)
-        row['api_gateway_latency'] = np.random.uniform(600, 1500)
-        row['api_gateway_availability'] = np.random.uniform(88, 96)
-        row['api_gateway_error_rate'] = np.random.uniform(5, 15)
-        row['api_gateway_throughput'] = np.random.uniform(50, 80)
-        
-        # High risk topology features
-        row['dependency_health_score'] = np.random.uniform(40, 70)
-        row['cascade_risk'] = np.random.uniform(0.5, 0.8)
-        row['slo_violation_count'] = np.random.randint(6, 12)
-        row['critical_path_latency'] = np.random.uniform(800, 1800)
-        
-        # Very likely to have incident soon
-        row['will_have_incident'] = 1 if np.random.random() > 0.2 else 0
-        
-        data.append(row)
-    
-    return data
-
-def main():
-    print("\nGenerating training data with extreme scenarios...")
+    # Pick a service to degrade per row; other services slightly affected
+    degraded_service = rng.integers(0, len(SERVICES), num_samples)
+    for i, prefix in enumerate(SERVICE_PREFIXES):
+        is_degraded = degraded_service == i
+        _fill_service(X, prefix, DEGRADED, rng, is_degraded)
+        _fill_service(X, prefix, SLIGHTLY_AFFECTED, rng, ~is_degraded)
     
-    # Combine all scenarios
-    all_data = []
+    _fill_topology(X, rng, (70, 90), (0.3, 0.6), (2, 8), (500, 1500))
     
-    print("- Generating 3000 normal operations samples...")
-    all_data.extend(generate_normal_operations(3000))
+    # Medium risk of incident
+    y = (rng.random(num_samples) > 0.5).astype(np.int8)
+    return X, y
+
+def generate_cascade_failures(num_samples=2500, rng=None):
+    """Generate complete cascade failure scenarios - CRITICAL for training!"""
+    rng = rng if rng is not None else np.random.default_rng()
+    X = _new_block(num_samples, rng)
     
-    print("- Generating 2000 degraded scenarios...")
-    all_data.extend(generate_degraded_scenarios(2000))
+    # Scenario type per row: 0 = database_down, 1 = partial_cascade, 2 = complete_failure
+    scenario = rng.integers(0, 3, num_samples)
+    database_down = scenario == 0
+    partial_cascade = scenario == 1
+    complete_failure = scenario == 2
     
-    print("- Generating 2500 CASCADE FAILURE scenarios...")
-    all_data.extend(generate_cascade_failures(2500))
+    # Database completely down - availability can be 0, error rate can be 100
+    _fill_service(X, 'database', {
+        'cpu': (30, 50), 'memory': (35, 55), 'latency': (1000, 2000),
+        'availability': (0, 60), 'error_rate': (40, 100), 'throughput': (0, 50)
+    }, rng, database_down)
+    # Auth and User services fail due to database
+    _fill_service(X, 'auth_service', DOWN, rng, database_down)
+    _fill_service(X, 'user_service', DOWN, rng, database_down)
+    # API Gateway fails due to dependencies
+    _fill_service(X, 'api_gateway', dict(DOWN, cpu=(35, 50), memory=(40, 55)), rng, database_down)
     
-    print("- Generating 2000 near-failure scenarios...")
-    all_data.extend(generate_near_failure_scenarios(2000))
+    # Partial cascade - database degraded, one service down, one degraded
+    _fill_service(X, 'database', {
+        'cpu': (80, 95), 'memory': (75, 90), 'latency': (800, 1500),
+        'availability': (70, 85), 'error_rate': (10, 30), 'throughput': (30, 70)
+    }, rng, partial_cascade)
+    auth_down = rng.random(num_samples) > 0.5
+    _fill_service(X, 'auth_service', DOWN, rng, partial_cascade & auth_down)
+    _fill_service(X, 'user_service', STRESSED, rng, partial_cascade & auth_down)
+    _fill_service(X, 'user_service', DOWN, rng, partial_cascade & ~auth_down)
+    _fill_service(X, 'auth_service', STRESSED, rng, partial_cascade & ~auth_down)
+    # API Gateway severely degraded
+    _fill_service(X, 'api_gateway', {
+        'cpu': (80, 95), 'memory': (75, 90), 'latency': (1000, 2000),
+        'availability': (50, 80), 'error_rate': (30, 70), 'throughput': (10, 50)
+    }, rng, partial_cascade)
     
-    # Create DataFrame
-    df = pd.DataFrame(all_data)
-    print(f"\nTotal samples: {len(df)}")
-    print(f"Incident rate: {df['will_have_incident'].mean()*100:.1f}%")
+    # Complete failure - everything is down
+    for prefix in SERVICE_PREFIXES:
+        _fill_service(X, prefix, dict(DOWN, cpu=(10, 40), memory=(20, 50)), rng, complete_failure)
     
-    # Save sample for inspection
-    df.head(100).to_csv("training_data_v2.csv", index=False)
-    print("Sample saved to training_data_v2.csv")
+    # Extreme topology features for cascade scenarios
+    _fill_topology(X, rng, (0, 30), (0.6, 1.0), (12, 16), 2000)
     
-    # Check extreme values in data
-    print("\nData statistics:")
-    print(f"- Min availability: {df[[col for col in df.columns if 'availability' in col]].min().min():.1f}")
-    print(f"- Max error_rate: {df[[col for col in df.columns if 'error_rate' in col]].max().max():.1f}")
-    print(f"- Max SLO violations: {df['slo_violation_count'].max()}")
-    print(f"- Services with 0% availability: {(df[[col for col in df.columns if 'availability' in col]] == 0).sum().sum()} instances")
-    print(f"- Services with 100% error rate: {(df[[col for col in df.columns if 'error_rate' in col]] == 100).sum().sum()} instances")
-    
-    # Prepare features and labels
-    feature_cols = [col for col in df.columns if col != 'will_have_incident']
-    X = df[feature_cols]
-    y = df['will_have_incident']
-    
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y
-    )
+    # ALWAYS an incident in cascade scenarios
+    y = np.ones(num_samples, dtype=np.int8)
+    return X, y
+
+def generate_near_failure_scenarios(num_samples=2000, rng=None):
+    """Generate scenarios right before cascade failure"""
+    rng = rng if rng is not None else np.random.default_rng()
+    X = _new_block(num_samples, rng)
     
-    print(f"\nTraining set: {len(X_train)} samples")
-    print(f"Test set: {len(X_test)} samples")
+    # Database under extreme stress but not down yet
+    _fill_service(X, 'database', {
+        'cpu': (85, 98), 'memory': (85, 95), 'latency': (800, 1800),
+        'availability': (75, 90), 'error_rate': (8, 25), 'throughput': (40, 70)
+    }, rng)
     
-    # Train XGBoost
-    print("\nTraining XGBoost model...")
-    model = xgb.XGBClassifier(
-        n_estimators=150,
-        max_depth=8,
-        learning_rate=0.1,
-        objective='binary:logistic',
-        random_state=42,
-        eval_metric='logloss',
-        scale_pos_weight=1,  # Balanced for incident detection
-        subsample=0.8,
-        colsample_bytree=0.8
-    )
+    # Other services showing stress
+    for prefix in ['auth_service', 'user_service']:
+        _fill_service(X, prefix, {
+            'cpu': (70, 90), 'memory': (65, 85), 'latency': (400, 1200),
+            'availability': (90, 97), 'error_rate': (3, 10), 'throughput': (60, 90)
+        }, rng)
     
-    model.fit(
-        X_train, y_train,
-        eval_set=[(X_test, y_test)],
-        verbose=False
-    )
+    # API Gateway struggling
+    _fill_service(X, 'api_gateway', {
+        'cpu': (75, 92), 'memory': (70, 88), 'latency': (600, 1500),
+        'availability': (88, 96), 'error_rate': (5, 15), 'throughput': (50, 80)
+    }, rng)
     
-    # Evaluate
-    y_pred = model.predict(X_test)
-    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    # High risk topology features
+    _fill_topology(X, rng, (40, 70), (0.5, 0.8), (6, 12), (800, 1800))
     
-    print("\n" + "="*60)
-    print("MODEL PERFORMANCE")
-    print("="*60)
-    print(f"Accuracy:  {accuracy_score(y_test, y_pred):.4f}")
-    print(f"Precision: {precision_score(y_test, y_pred):.4f}")
-    print(f"Recall:    {recall_score(y_test, y_pred):.4f}")
-    print(f"F1 Score:  {f1_score(y_test, y_pred):.4f}")
-    
-    print("\nClassification Report:")
-    print(classification_report(y_test, y_pred, 
-                                target_names=['No Incident', 'Will Have Incident']))
+    # Very likely to have incident soon
+    y = (rng.random(num_samples) > 0.2).astype(np.int8)
+    return X, y
+
+# Scenario generators and their base sample counts
+SCENARIOS = [
+    ('normal operations', generate_normal_operations, 3000),
+    ('degraded scenarios', generate_degraded_scenarios, 2000),
+    ('CASCADE FAILURE scenarios', generate_cascade_failures, 2500),
+    ('near-failure scenarios', generate_near_failure_scenarios, 2000),
+]
+
+def generate_training_data(scale=1.0, rng=None):
+    """Generate all scenarios as one (X, y) pair of columnar arrays"""
+    rng = rng if rng is not None else np.random.default_rng()
+    blocks, labels = [], []
+    for name, generator, base_samples in SCENARIOS:
+        num_samples = int(base_samples * scale)
+        print(f"- Generating {num_samples} {name}...")
+        X, y = generator(num_samples, rng)
+        blocks.append(X)
+        labels.append(y)
+    return np.concatenate(blocks), np.concatenate(labels)
+
+def generate_series(generator, shape, num_series, length=60, rng=None):
+    """Time-series version of a scenario generator: (num_series, length, features) snapshots and labels
+
+    Each series moves from a normal-operations snapshot toward one drawn from
+    generator: 'steady' stays put, 'spike' jumps there for 1-3 steps and
+    recovers, 'ramp' drifts there from a random onset. Ramps take the target's
+    label once they are half-way; spikes are never incidents.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    start, _ = generate_normal_operations(num_series, rng)
+    target, target_y = generator(num_series, rng)
+    steps = np.arange(length)
+    if shape == 'steady':
+        progress = np.zeros((num_series, length), dtype=np.float32)
+    elif shape == 'spike':
+        onset = rng.integers(5, length - 3, num_series)[:, None]
+        duration = rng.integers(1, 4, num_series)[:, None]
+        progress = ((steps >= onset) & (steps < onset + duration)).astype(np.float32)
+    else:
+        onset = rng.integers(0, length // 2, num_series)[:, None]
+        ramp = rng.integers(10, 30, num_series)[:, None]
+        progress = np.clip((steps - onset) / ramp, 0, 1).astype(np.float32)
     
-    # Test on extreme cases
-    print("\n" + "="*60)
-    print("TESTING ON EXTREME SCENARIOS")
-    print("="*60)
+    X = start[:, None, :] + (target - start)[:, None, :] * progress[:, :, None]
+    X *= 1 + 0.03 * rng.standard_normal(X.shape, dtype=np.float32)
+    # Time of day is fixed per series; counts stay whole and percentages capped
+    time_columns = [COLUMN_INDEX[col] for col in ('hour_of_day', 'is_peak_hour', 'is_weekend')]
+    X[:, :, time_columns] = start[:, None, time_columns]
+    X[:, :, COLUMN_INDEX['slo_violation_count']] = np.round(X[:, :, COLUMN_INDEX['slo_violation_count']])
+    capped = [i for col, i in COLUMN_INDEX.items()
+              if col.endswith(('_cpu', '_memory', '_availability', '_error_rate')) or col == 'dependency_health_score']
+    X[:, :, capped] = np.clip(X[:, :, capped], 0, 100)
     
+    if shape == 'ramp':
+        y = ((target_y[:, None] == 1) & (progress >= 0.5)).astype(np.int8)
+    else:
+        y = np.zeros((num_series, length), dtype=np.int8)
+    return X, y
+
+# Time-series scenarios: target generator, trajectory shape and base series count
+SERIES_SCENARIOS = [
+    ('steady series', generate_normal_operations, 'steady', 40),
+    ('transient degradation spikes', generate_degraded_scenarios, 'spike', 40),
+    ('gradual degradations', generate_degraded_scenarios, 'ramp', 20),
+    ('ramps into near-failure', generate_near_failure_scenarios, 'ramp', 25),
+    ('ramps into cascade failure', generate_cascade_failures, 'ramp', 25),
+]
+SERIES_LENGTH = 60
+
+def generate_temporal_training_data(scale=1.0, rng=None, series_chunk=2000):
+    """Point-in-time scenarios with cold rolling windows plus time-series scenarios with warm ones"""
+    rng = rng if rng is not None else np.random.default_rng()
+    spec = RollingFeatureSpec(TEMPORAL_FEATURE_COLUMNS, ROLLING_CONFIG)
+    X, y = generate_training_data(scale, rng)
+    # A cold window is exactly what a stateless /predict request gets
+    blocks, labels = [spec.expand(X)], [y]
+    for name, generator, shape, base_series in SERIES_SCENARIOS:
+        num_series = int(base_series * scale)
+        print(f"- Generating {num_series} {name} ({SERIES_LENGTH} steps each)...")
+        for start in range(0, num_series, series_chunk):
+            series, series_y = generate_series(generator, shape, min(series_chunk, num_series - start),
+                                               SERIES_LENGTH, rng)
+            blocks.append(spec.expand_series(series))
+            labels.append(series_y.ravel())
+    return np.concatenate(blocks), np.concatenate(labels)
+
+def generate_dataset(scale=1.0, rng=None, temporal=False):
+    """(X, y, feature columns, rolling spec) for a point-in-time or --temporal model"""
+    if temporal:
+        X, y = generate_temporal_training_data(scale, rng)
+        return X, y, TEMPORAL_FEATURE_COLUMNS, RollingFeatureSpec(TEMPORAL_FEATURE_COLUMNS, ROLLING_CONFIG)
+    X, y = generate_training_data(scale, rng)
+    return X, y, FEATURE_COLUMNS, None
+
+def mix_captured_data(X_train, y_train, captured, rolling=None, rng=None):
+    """Append rows captured by the server's PREDICTION_LOG_DIR to a training split
+
+    Captured traffic has no ground truth: each row is labelled with the
+    served model's decision (probability > 0.5), so the rows only ever go
+    into training; test and validation metrics stay on synthetic labels.
+    Segments lacking any of FEATURE_COLUMNS (a --compress model's log) are
+    skipped. Returns (X_train, y_train, metadata).
+    """
+    X_captured, probs = load_log(captured['log_dir'], FEATURE_COLUMNS, captured.get('max_rows'), rng)
+    y_captured = (probs > 0.5).astype(np.asarray(y_train).dtype)
+    print(f"- Mixing {len(X_captured)} captured snapshots from {captured['log_dir']} into the training split "
+          f"({int(y_captured.sum())} labelled incident by the served model)")
+    metadata = {'log_dir': captured['log_dir'], 'rows': len(X_captured), 'incidents': int(y_captured.sum())}
+    if not len(X_captured):
+        return X_train, y_train, metadata
+    if rolling is not None:
+        # Captured rows were stateless requests: a cold window each, as the server scored them
+        X_captured = rolling.expand(X_captured)
+    if isinstance(X_train, pd.DataFrame):
+        X_captured = pd.DataFrame(X_captured.astype(X_train.dtypes.iloc[0]), columns=X_train.columns)
+        return (pd.concat([X_train, X_captured], ignore_index=True),
+                pd.concat([y_train, pd.Series(y_captured, name=y_train.name)], ignore_index=True), metadata)
+    return np.concatenate([X_train, X_captured.astype(X_train.dtype)]), np.concatenate([y_train, y_captured]), metadata
+
+def extreme_scenario_row(column_means, rolling=None):
+    """The complete-system-failure case as a one-row DataFrame; other columns take column_means"""
     # Create extreme test case - everything down
     extreme_test = {}
-    for col in feature_cols:
+    for col in FEATURE_COLUMNS:
         if 'availability' in col:
             extreme_test[col] = 0
         elif 'error_rate' in col:
@@ -372,25 +356,92 @@ def main():
         elif col == 'critical_path_latency':
             extreme_test[col] = 2000
         else:
-            extreme_test[col] = X_test[col].mean()
+            extreme_test[col] = column_means[col]
     
     extreme_df = pd.DataFrame([extreme_test])
+    if rolling is not None:
+        # First snapshot of a failure: the rolling windows hold only this row
+        extreme_df = pd.DataFrame(rolling.expand(extreme_df.to_numpy()), columns=TEMPORAL_FEATURE_COLUMNS)
+    return extreme_df
+
+def test_extreme_scenario(model, column_means, rolling=None):
+    """Score the complete-system-failure case; other columns take their test-set mean"""
+    print("\n" + "="*60)
+    print("TESTING ON EXTREME SCENARIOS")
+    print("="*60)
+    
+    extreme_df = extreme_scenario_row(column_means, rolling)
     extreme_pred = model.predict_proba(extreme_df)[0, 1]
     print(f"Complete system failure prediction: {extreme_pred*100:.1f}% incident probability")
-    
+    return extreme_pred
+
+def save_model(model, feature_cols, parity_rows=None, training_metadata=None, rolling_config=None):
+    """Save the model artifacts the server loads, finishing with the manifest
+
+    parity_rows are held-out rows: they check the tree bundle and become
+    the drift reference the server compares live traffic against.
+    """
     # Save model
     print("\nSaving model...")
+    model_bytes = pickle.dumps(model)
     with open('../models/model.pkl', 'wb') as f:
-        pickle.dump(model, f)
+        f.write(model_bytes)
     print("Model saved to ../models/model.pkl")
     
+    export_trees(model, hashlib.sha256(model_bytes).hexdigest(), parity_rows)
+    
     # Save feature names
     with open('../models/features.txt', 'w') as f:
         for feature in feature_cols:
             f.write(f"{feature}\n")
     print("Features saved to ../models/features.txt")
     
-    # Feature importance
+    drift_reference = reference_histograms(parity_rows, feature_cols) if parity_rows is not None else None
+    write_manifest(model, feature_cols, training_metadata, rolling_config, drift_reference)
+
+def export_trees(model, source_checksum, parity_rows=None):
+    """Flatten the booster for the NumPy tree engine and verify it matches predict_proba"""
+    engine = tree_engine.export_trees(model, '../models/model_trees.npz', source_checksum)
+    print(f"Tree bundle saved to ../models/model_trees.npz ({engine.num_trees} trees)")
+    if parity_rows is not None:
+        max_diff = tree_engine.check_parity(model, engine, parity_rows)
+        print(f"Tree engine parity on {len(parity_rows)} rows: max |diff| = {max_diff:.2e}")
+
+def write_manifest(model, feature_cols, training_metadata=None, rolling_config=None, drift_reference=None):
+    """Write the native UBJSON booster and the manifest the server loads first
+
+    The manifest is written last: its checksums only match once every
+    artifact it lists is complete. rolling_config tells the server how to
+    compute the rolling features of a --temporal model; drift_reference
+    holds the per-feature histograms its drift monitor compares against.
+    """
+    model.save_model('../models/model.ubj')
+    print("Booster saved to ../models/model.ubj")
+    
+    artifacts = {}
+    for name, file_name in (('booster', 'model.ubj'), ('trees', 'model_trees.npz')):
+        with open(f'../models/{file_name}', 'rb') as f:
+            artifacts[name] = {'file': file_name, 'sha256': hashlib.sha256(f.read()).hexdigest()}
+    
+    manifest = {
+        'format_version': 1,
+        'features': list(feature_cols),
+        'artifacts': artifacts,
+        'xgboost_version': xgb.__version__,
+        'trained_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'training': training_metadata or {},
+    }
+    if rolling_config:
+        manifest['rolling'] = rolling_config
+    if drift_reference:
+        manifest['drift_reference'] = drift_reference
+    manifest_path = '../models/model_manifest.json'
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, default=float)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    print(f"Manifest saved to {manifest_path}")
+
+def print_feature_importance(model, feature_cols):
     feature_importance = pd.DataFrame({
         'feature': feature_cols,
         'importance': model.feature_importances_
@@ -399,11 +450,697 @@ def main():
     print(f"\nTop 10 Most Important Features:")
     for idx, row in feature_importance.head(10).iterrows():
         print(f"{row['feature']:35s}: {row['importance']:.4f}")
-    
+
+def print_training_complete():
     print("\n" + "="*60)
     print("TRAINING COMPLETE!")
     print("Model is now trained on cascade failures and extreme scenarios")
     print("="*60)
 
+class ShardIterator(xgb.DataIter):
+    """Feeds .npy shards to xgboost one memory-mapped shard at a time (external memory)"""
+    
+    def __init__(self, shards, cache_prefix):
+        self._shards = shards
+        self._position = 0
+        super().__init__(cache_prefix=cache_prefix)
+    
+    def next(self, input_data):
+        if self._position == len(self._shards):
+            return False
+        X, y = load_shard(self._shards[self._position])
+        input_data(data=X, label=y, feature_names=FEATURE_COLUMNS)
+        self._position += 1
+        return True
+    
+    def reset(self):
+        self._position = 0
+
+def load_shard(stem):
+    """Memory-map one (X, y) shard written by write_shards"""
+    return np.load(f'{stem}_X.npy', mmap_mode='r'), np.load(f'{stem}_y.npy', mmap_mode='r')
+
+def write_shards(shard_dir, scale=1.0, rng=None, chunk_size=500_000, test_size=0.2):
+    """Stream every generator's output to train/test .npy shards of at most chunk_size rows"""
+    rng = rng if rng is not None else np.random.default_rng()
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = {'train': [], 'test': []}
+    
+    for name, generator, base_samples in SCENARIOS:
+        num_samples = int(base_samples * scale)
+        print(f"- Generating {num_samples} {name} in chunks of {chunk_size}...")
+        for start in range(0, num_samples, chunk_size):
+            X, y = generator(min(chunk_size, num_samples - start), rng)
+            # Rows are i.i.d. within a chunk, so the tail is a random hold-out
+            split = int(len(X) * (1 - test_size))
+            for part, rows in (('train', slice(None, split)), ('test', slice(split, None))):
+                stem = os.path.join(shard_dir, f'{part}_{len(shards[part]):05d}')
+                np.save(f'{stem}_X.npy', np.ascontiguousarray(X[rows]))
+                np.save(f'{stem}_y.npy', y[rows])
+                shards[part].append(stem)
+            del X, y
+    
+    return shards
+
+def sample_shards(shards, num_rows, rng):
+    """Up to num_rows rows drawn across all shards in proportion to their size"""
+    sizes = np.array([len(load_shard(stem)[1]) for stem in shards])
+    take = np.minimum(sizes, np.ceil(num_rows * sizes / max(sizes.sum(), 1)).astype(int))
+    parts = []
+    for stem, size, count in zip(shards, sizes, take):
+        X, _ = load_shard(stem)
+        parts.append(np.asarray(X[np.sort(rng.choice(size, size=count, replace=False))]))
+    return np.concatenate(parts)[:num_rows]
+
+def evaluate_shards(model, shards, batch_size=500_000):
+    """Stream the test shards: confusion counts and per-column means in constant memory"""
+    tp = fp = fn = tn = 0
+    column_sums = np.zeros(len(FEATURE_COLUMNS))
+    total = 0
+    for stem in shards:
+        X, y = load_shard(stem)
+        for start in range(0, len(X), batch_size):
+            X_batch = np.asarray(X[start:start + batch_size])
+            y_batch = np.asarray(y[start:start + batch_size]) == 1
+            y_pred = model.predict_proba(X_batch)[:, 1] > 0.5
+            tp += int(np.count_nonzero(y_pred & y_batch))
+            fp += int(np.count_nonzero(y_pred & ~y_batch))
+            fn += int(np.count_nonzero(~y_pred & y_batch))
+            tn += int(np.count_nonzero(~y_pred & ~y_batch))
+            column_sums += X_batch.sum(axis=0, dtype=np.float64)
+            total += len(X_batch)
+    column_means = dict(zip(FEATURE_COLUMNS, column_sums / max(total, 1)))
+    return (tp, fp, fn, tn), column_means
+
+def main_out_of_core(shard_dir, scale=1.0, seed=42, chunk_size=500_000, n_jobs=None):
+    """Train from on-disk shards so peak memory is bounded by chunk_size, not sample count"""
+    print(f"\nGenerating training data to {shard_dir} (out-of-core)...")
+    rng = np.random.default_rng(seed)
+    shards = write_shards(shard_dir, scale, rng, chunk_size)
+    
+    print(f"\nTraining shards: {len(shards['train'])}")
+    print(f"Test shards: {len(shards['test'])}")
+    
+    # External-memory DMatrix: xgboost pages the data through its on-disk cache
+    print("\nTraining XGBoost model (external memory)...")
+    dtrain = xgb.DMatrix(ShardIterator(shards['train'], os.path.join(shard_dir, 'train_cache')))
+    dtest = xgb.DMatrix(ShardIterator(shards['test'], os.path.join(shard_dir, 'test_cache')))
+    
+    params = {key: value for key, value in MODEL_PARAMS.items() if key != 'n_estimators'}
+    if n_jobs:
+        params['nthread'] = n_jobs
+    booster = xgb.train(
+        params, dtrain,
+        num_boost_round=MODEL_PARAMS['n_estimators'],
+        evals=[(dtest, 'test')],
+        verbose_eval=False
+    )
+    del dtrain, dtest
+    
+    # Wrap the booster so the server keeps its XGBClassifier interface
+    booster_path = os.path.join(shard_dir, 'booster.json')
+    booster.save_model(booster_path)
+    model = xgb.XGBClassifier()
+    model.load_model(booster_path)
+    
+    (tp, fp, fn, tn), column_means = evaluate_shards(model, shards['test'])
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    
+    print("\n" + "="*60)
+    print("MODEL PERFORMANCE")
+    print("="*60)
+    print(f"Accuracy:  {(tp + tn) / max(tp + fp + fn + tn, 1):.4f}")
+    print(f"Precision: {precision:.4f}")
+    print(f"Recall:    {recall:.4f}")
+    print(f"F1 Score:  {2 * precision * recall / (precision + recall) if precision + recall else 0.0:.4f}")
+    print(f"\nConfusion matrix: TP={tp} FP={fp} FN={fn} TN={tn}")
+    
+    extreme_pred = test_extreme_scenario(model, column_means)
+    training_metadata = {
+        'mode': 'out-of-core',
+        'samples': tp + fp + fn + tn + sum(len(load_shard(stem)[1]) for stem in shards['train']),
+        'scale': scale,
+        'seed': seed,
+        'params': MODEL_PARAMS,
+        'metrics': {'precision': precision, 'recall': recall},
+        'extreme_failure_probability': extreme_pred,
+    }
+    save_model(model, FEATURE_COLUMNS, sample_shards(shards['test'], 10000, rng), training_metadata)
+    print_feature_importance(model, FEATURE_COLUMNS)
+    print_training_complete()
+
+# Hyperparameter search space; --search random samples configurations from the same grid
+SEARCH_GRID = {
+    'max_depth': [4, 6, 8, 10],
+    'learning_rate': [0.05, 0.1, 0.3],
+    'subsample': [0.8, 1.0],
+    'colsample_bytree': [0.8, 1.0],
+    'min_child_weight': [1, 5],
+}
+# Trials stop early, so this is only a ceiling on boosting rounds
+SEARCH_MAX_ROUNDS = 1000
+
+def search_configurations(strategy, num_trials, rng):
+    """Every grid point, or num_trials distinct random ones"""
+    names = list(SEARCH_GRID)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(SEARCH_GRID[name] for name in names))]
+    if strategy == 'grid':
+        return grid
+    return [grid[i] for i in rng.choice(len(grid), size=min(num_trials, len(grid)), replace=False)]
+
+def _reset_peak_rss():
+    """Reset this process's peak RSS counter (Linux); False where unsupported"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux and never resets: an upper bound per trial
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+_search_data = None
+
+def _load_search_data(data_dir, feature_cols):
+    """Pool initializer: memory-map the train/validation split written by main_search"""
+    global _search_data
+    arrays = {name: np.load(os.path.join(data_dir, f'{name}.npy'), mmap_mode='r')
+              for name in ('X_train', 'y_train', 'X_valid', 'y_valid')}
+    _search_data = {
+        'train': (pd.DataFrame(arrays['X_train'], columns=feature_cols, copy=False), arrays['y_train']),
+        'valid': (pd.DataFrame(arrays['X_valid'], columns=feature_cols, copy=False), arrays['y_valid']),
+    }
+
+def run_trial(trial_id, config, threads, early_stopping_rounds, model_dir):
+    """Train one configuration with hist + early stopping; saves the model and returns its metrics"""
+    X_train, y_train = _search_data['train']
+    X_valid, y_valid = _search_data['valid']
+    params = dict(MODEL_PARAMS, **config, n_estimators=SEARCH_MAX_ROUNDS, n_jobs=threads,
+                  early_stopping_rounds=early_stopping_rounds)
+
+    _reset_peak_rss()
+    started = time.perf_counter()
+    model = xgb.XGBClassifier(**params)
+    model.fit(X_train, y_train, eval_set=[(X_valid, y_valid)], verbose=False)
+    wall = time.perf_counter() - started
+
+    y_pred = model.predict(X_valid)
+    model_path = os.path.join(model_dir, f'trial_{trial_id:03d}.ubj')
+    model.save_model(model_path)
+    return {
+        'trial': trial_id,
+        'params': config,
+        'best_iteration': int(model.best_iteration),
+        'valid_logloss': float(model.best_score),
+        'f1': f1_score(y_valid, y_pred),
+        'recall': recall_score(y_valid, y_pred),
+        'precision': precision_score(y_valid, y_pred),
+        'wall_seconds': wall,
+        'peak_rss_mb': _peak_rss_mb(),
+        'model_path': model_path,
+    }
+
+def main_search(scale=1.0, seed=42, temporal=False, strategy='random', num_trials=20, cores=None,
+                trial_threads=1, early_stopping_rounds=30, captured=None):
+    """Search SEARCH_GRID across a process pool and save the best model plus a leaderboard"""
+    cores = cores or available_cores()
+    workers = max(1, cores // trial_threads)
+    rng = np.random.default_rng(seed)
+    print("\nGenerating training data with extreme scenarios...")
+    X_all, y_all, feature_cols, rolling = generate_dataset(scale, rng, temporal)
+
+    # Same test split as main(); early stopping and ranking use a validation split of the rest
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_all, y_all, test_size=0.2, random_state=42, stratify=y_all
+    )
+    X_train, X_valid, y_train, y_valid = train_test_split(
+        X_train, y_train, test_size=0.2, random_state=seed, stratify=y_train
+    )
+    del X_all, y_all
+    captured_metadata = None
+    if captured:
+        X_train, y_train, captured_metadata = mix_captured_data(X_train, y_train, captured, rolling, rng)
+    configs = search_configurations(strategy, num_trials, rng)
+    print(f"\nTraining: {len(X_train)}  Validation: {len(X_valid)}  Test: {len(X_test)} samples")
+    print(f"Searching {len(configs)} configurations ({strategy}) on {workers} worker(s) x {trial_threads} thread(s)...")
+
+    leaderboard = []
+    with tempfile.TemporaryDirectory(prefix='sre-search-') as scratch:
+        # Workers memory-map the split instead of receiving a pickled copy each
+        for name, array in (('X_train', X_train), ('y_train', y_train), ('X_valid', X_valid), ('y_valid', y_valid)):
+            np.save(os.path.join(scratch, f'{name}.npy'), np.ascontiguousarray(array))
+        started = time.perf_counter()
+        # spawn: forking a parent with OpenMP state can deadlock xgboost in the children
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_load_search_data, initargs=(scratch, feature_cols)) as pool:
+            futures = [pool.submit(run_trial, trial_id, config, trial_threads, early_stopping_rounds, scratch)
+                       for trial_id, config in enumerate(configs)]
+            for future in as_completed(futures):
+                trial = future.result()
+                leaderboard.append(trial)
+                print(f"  trial {trial['trial']:3d}: F1 {trial['f1']:.4f}  recall {trial['recall']:.4f}  "
+                      f"{trial['best_iteration'] + 1:4d} rounds  {trial['wall_seconds']:6.1f}s  "
+                      f"{trial['peak_rss_mb']:6.0f} MiB")
+        search_seconds = time.perf_counter() - started
+
+        leaderboard.sort(key=lambda trial: (-trial['f1'], -trial['recall'], trial['valid_logloss']))
+        best = leaderboard[0]
+        model = xgb.XGBClassifier()
+        model.load_model(best['model_path'])
+    for rank, trial in enumerate(leaderboard, 1):
+        trial['rank'] = rank
+        del trial['model_path']
+
+    print("\n" + "="*60)
+    print(f"SEARCH LEADERBOARD ({len(leaderboard)} trials in {search_seconds:.1f}s)")
+    print("="*60)
+    print(f"{'rank':>4s} {'F1':>7s} {'recall':>7s} {'rounds':>6s} {'seconds':>8s}  params")
+    for trial in leaderboard[:10]:
+        print(f"{trial['rank']:4d} {trial['f1']:7.4f} {trial['recall']:7.4f} {trial['best_iteration'] + 1:6d} "
+              f"{trial['wall_seconds']:8.1f}  {trial['params']}")
+
+    X_test = pd.DataFrame(X_test, columns=feature_cols)
+    y_pred = model.predict(X_test)
+    test_metrics = {
+        'accuracy': accuracy_score(y_test, y_pred),
+        'precision': precision_score(y_test, y_pred),
+        'recall': recall_score(y_test, y_pred),
+        'f1': f1_score(y_test, y_pred),
+    }
+    print("\n" + "="*60)
+    print(f"BEST MODEL (trial {best['trial']}) ON THE TEST SET")
+    print("="*60)
+    for name, value in test_metrics.items():
+        print(f"{name.capitalize() + ':':10s} {value:.4f}")
+
+    extreme_pred = test_extreme_scenario(model, X_test.mean(), rolling)
+    search_metadata = {
+        'strategy': strategy,
+        'trials': len(leaderboard),
+        'cores': cores,
+        'trial_threads': trial_threads,
+        'early_stopping_rounds': early_stopping_rounds,
+        'seconds': search_seconds,
+    }
+    training_metadata = {
+        'mode': 'search',
+        'temporal': temporal,
+        'samples': len(X_train) + len(X_valid) + len(X_test),
+        'scale': scale,
+        'seed': seed,
+        'params': dict(MODEL_PARAMS, **best['params'], n_estimators=best['best_iteration'] + 1),
+        'metrics': test_metrics,
+        'extreme_failure_probability': extreme_pred,
+        'search': search_metadata,
+        'captured': captured_metadata,
+    }
+    save_model(model, feature_cols, X_test.to_numpy()[:10000], training_metadata, ROLLING_CONFIG if temporal else None)
+
+    leaderboard_path = '../models/search_leaderboard.json'
+    with open(leaderboard_path, 'w') as f:
+        json.dump({**search_metadata, 'leaderboard': leaderboard}, f, indent=2, default=float)
+    print(f"Leaderboard saved to {leaderboard_path}")
+    print_feature_importance(model, feature_cols)
+    print_training_complete()
+
+def load_saved_model():
+    """(model, pickle bytes, feature columns, rolling config) of ../models/model.pkl"""
+    with open('../models/model.pkl', 'rb') as f:
+        model_bytes = f.read()
+    with open('../models/features.txt', 'r') as f:
+        feature_cols = [line.strip() for line in f if line.strip()]
+    # Keep the rolling-feature layout of a --temporal model
+    rolling_config = None
+    if os.path.exists('../models/model_manifest.json'):
+        with open('../models/model_manifest.json', 'r') as f:
+            rolling_config = json.load(f).get('rolling')
+    return pickle.loads(model_bytes), model_bytes, feature_cols, rolling_config
+
+# Compression search: tree counts are prefixes of one model per (depth, feature subset)
+COMPRESS_TREE_COUNTS = [10, 25, 50, 100, 150]
+COMPRESS_DEPTHS = [3, 4, 6, 8]
+# Top-k features by the reference model's importance; None keeps them all
+COMPRESS_FEATURE_COUNTS = [8, 12, 16, 24, None]
+
+def classification_metrics(y, incident_prob):
+    y_pred = incident_prob > 0.5
+    return {
+        'accuracy': accuracy_score(y, y_pred),
+        'precision': precision_score(y, y_pred),
+        'recall': recall_score(y, y_pred),
+        'f1': f1_score(y, y_pred),
+    }
+
+def measure_latencies(engines, samples=200, rounds=5):
+    """p50 single-row predict_proba latency in microseconds per (engine, X) pair (the serving path)
+
+    Engines are timed round-robin and keep their best round, so drift in
+    machine load hits every candidate alike instead of whichever ran last.
+    """
+    best = [float('inf')] * len(engines)
+    for _ in range(rounds):
+        for i, (engine, X) in enumerate(engines):
+            timings = []
+            for row in X[:samples]:
+                started = time.perf_counter()
+                engine.predict_proba(row[None, :])
+                timings.append(time.perf_counter() - started)
+            best[i] = min(best[i], float(np.percentile(timings, 50)) * 1e6)
+    return best
+
+def bundle_size_kb(arrays):
+    """Size of the .npz tree bundle the server would load"""
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.tell() / 1024
+
+def train_compact(X, labels, feature_cols, max_depth, num_trees):
+    """Train a compact booster; labels may be the reference model's probabilities (distillation)"""
+    params = {key: value for key, value in MODEL_PARAMS.items() if key != 'n_estimators'}
+    params['max_depth'] = max_depth
+    # binary:logistic takes soft targets in [0, 1] as well as 0/1 labels
+    return xgb.train(params, xgb.DMatrix(X, label=labels, feature_names=feature_cols), num_boost_round=num_trees)
+
+def as_classifier(booster):
+    """Wrap a booster in the XGBClassifier interface save_model and the server expect"""
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+    return model
+
+def pareto_front(candidates):
+    """Candidates no faster one beats on F1, fastest first"""
+    front = []
+    for candidate in sorted(candidates, key=lambda c: (c['latency_us'], -c['f1'])):
+        if not front or candidate['f1'] > front[-1]['f1']:
+            front.append(candidate)
+    return front
+
+def main_compress(scale=1.0, seed=42, latency_budget_us=None, size_budget_kb=None, recall_tolerance=0.01,
+                  f1_tolerance=0.02, distill=False):
+    """Replace ../models/model.pkl with the smallest model within budget and recall tolerance
+
+    Candidates must keep incident recall within recall_tolerance of the saved
+    model and still flag the complete-system-failure case. The F1 tolerance
+    stops a model that simply flags everything from winning on recall.
+    """
+    reference, _, reference_cols, rolling_config = load_saved_model()
+    temporal = bool(rolling_config)
+    print("\nGenerating training data with extreme scenarios...")
+    X_all, y_all, feature_cols, rolling = generate_dataset(scale, np.random.default_rng(seed), temporal)
+    # Same test split as main()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X_all, y_all, test_size=0.2, random_state=42, stratify=y_all
+    )
+    del X_all, y_all
+    column = {name: i for i, name in enumerate(feature_cols)}
+    extreme_row = extreme_scenario_row(dict(zip(feature_cols, X_test.mean(axis=0))), rolling)
+
+    engines = []
+
+    def describe(booster, names, **details):
+        """Evaluate one candidate on the test set and the extreme case; latency is timed later"""
+        arrays = tree_engine.flatten_booster(booster)
+        engine = tree_engine.TreeEnsemble(arrays)
+        X_candidate = np.ascontiguousarray(X_test[:, [column[name] for name in names]])
+        engines.append((engine, X_candidate))
+        return {
+            'trees': engine.num_trees,
+            'max_depth': engine.max_depth,
+            **details,
+            'features': len(names),
+            **classification_metrics(y_test, engine.predict_proba(X_candidate)[:, 1]),
+            'extreme_failure_probability': float(engine.predict_proba(extreme_row[names].to_numpy())[0, 1]),
+            'size_kb': bundle_size_kb(arrays),
+        }
+
+    baseline = describe(tree_engine.serving_booster(reference), reference_cols, name='reference')
+    recall_floor = baseline['recall'] - recall_tolerance
+    f1_floor = baseline['f1'] - f1_tolerance
+
+    # Feature subsets would break the rolling-feature layout of a --temporal model
+    feature_counts = [None] if temporal else COMPRESS_FEATURE_COUNTS
+    importance_order = [reference_cols[i] for i in np.argsort(-reference.feature_importances_)]
+    reference_X = X_train[:, [column[name] for name in reference_cols]]
+    labels = reference.predict_proba(reference_X)[:, 1] if distill else y_train
+    candidates, boosters = [], {}
+    print(f"Training compact models{' (distilled)' if distill else ''}...")
+    for count in feature_counts:
+        if count is not None and count >= len(reference_cols):
+            continue
+        names = reference_cols if count is None else [name for name in reference_cols if name in importance_order[:count]]
+        X_subset = X_train[:, [column[name] for name in names]]
+        for depth in COMPRESS_DEPTHS:
+            booster = train_compact(X_subset, labels, names, depth, max(COMPRESS_TREE_COUNTS))
+            for num_trees in COMPRESS_TREE_COUNTS:
+                name = f'f{len(names)}-d{depth}-t{num_trees}'
+                boosters[name] = (booster[:num_trees], names)
+                candidates.append(describe(boosters[name][0], names, name=name, trees=num_trees, max_depth=depth))
+
+    print(f"Timing {len(engines)} models on the tree engine...")
+    for candidate, latency_us in zip([baseline] + candidates, measure_latencies(engines)):
+        candidate['latency_us'] = latency_us
+    for candidate in candidates:
+        candidate['within_recall'] = bool(candidate['recall'] >= recall_floor
+                                          and candidate['f1'] >= f1_floor
+                                          and candidate['extreme_failure_probability'] > 0.5)
+        candidate['within_budget'] = bool(
+            (latency_budget_us is None or candidate['latency_us'] <= latency_budget_us)
+            and (size_budget_kb is None or candidate['size_kb'] <= size_budget_kb))
+
+    passing = [c for c in candidates if c['within_recall'] and c['within_budget']]
+    chosen = min(passing, key=lambda c: (c['size_kb'], c['latency_us'])) if passing else None
+
+    print("\n" + "="*60)
+    print("ACCURACY / LATENCY TRADE-OFF (Pareto front)")
+    print("="*60)
+    print(f"{'candidate':16s} {'F1':>7s} {'recall':>7s} {'extreme':>8s} {'p50 us':>8s} {'KiB':>8s}")
+    front = pareto_front(candidates)
+    for candidate in [baseline] + front + ([chosen] if chosen and chosen not in front else []):
+        flags = '' if candidate is baseline else (
+            ' <- chosen' if candidate is chosen else
+            '' if candidate['within_recall'] and candidate['within_budget'] else
+            ' (recall)' if not candidate['within_recall'] else ' (budget)')
+        print(f"{candidate['name']:16s} {candidate['f1']:7.4f} {candidate['recall']:7.4f} "
+              f"{candidate['extreme_failure_probability']:8.3f} {candidate['latency_us']:8.0f} "
+              f"{candidate['size_kb']:8.0f}{flags}")
+
+    report = {
+        'budgets': {'latency_us': latency_budget_us, 'size_kb': size_budget_kb},
+        'recall_tolerance': recall_tolerance,
+        'f1_tolerance': f1_tolerance,
+        'distill': distill,
+        'reference': baseline,
+        'chosen': chosen['name'] if chosen else None,
+        'candidates': candidates,
+    }
+    report_path = '../models/compression_report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2, default=float)
+    print(f"\nReport saved to {report_path}")
+    if chosen is None:
+        raise SystemExit(f"No candidate keeps recall >= {recall_floor:.4f} and F1 >= {f1_floor:.4f} within the budget; "
+                         "model left unchanged")
+
+    booster, names = boosters[chosen['name']]
+    model = as_classifier(booster)
+    print(f"\nChosen {chosen['name']}: {chosen['latency_us']:.0f}us vs {baseline['latency_us']:.0f}us, "
+          f"{chosen['size_kb']:.0f} KiB vs {baseline['size_kb']:.0f} KiB, recall {chosen['recall']:.4f}")
+    training_metadata = {
+        'mode': 'compressed',
+        'temporal': temporal,
+        'samples': len(X_train) + len(X_test),
+        'scale': scale,
+        'seed': seed,
+        'params': dict(MODEL_PARAMS, max_depth=chosen['max_depth'], n_estimators=chosen['trees']),
+        'metrics': {key: chosen[key] for key in ('accuracy', 'precision', 'recall', 'f1')},
+        'extreme_failure_probability': chosen['extreme_failure_probability'],
+        'compression': {key: report[key] for key in ('budgets', 'recall_tolerance', 'f1_tolerance', 'distill', 'chosen')},
+    }
+    X_parity = X_test[:10000, [column[name] for name in names]]
+    save_model(model, names, X_parity, training_metadata, rolling_config)
+
+def main_export_artifacts():
+    """Re-export the tree bundle, UBJSON booster and manifest from ../models/model.pkl"""
+    model, model_bytes, feature_cols, rolling_config = load_saved_model()
+    X, _ = generate_training_data(scale=1.0, rng=np.random.default_rng(0))
+    all_cols = FEATURE_COLUMNS
+    if rolling_config:
+        X = RollingFeatureSpec(TEMPORAL_FEATURE_COLUMNS, rolling_config).expand(X)
+        all_cols = TEMPORAL_FEATURE_COLUMNS
+    # A compressed model may use a subset of the columns
+    X = X[:, [all_cols.index(col) for col in feature_cols]]
+    export_trees(model, hashlib.sha256(model_bytes).hexdigest(), X)
+    write_manifest(model, feature_cols, {'mode': 'exported', 'source': 'model.pkl'}, rolling_config,
+                   reference_histograms(X, feature_cols))
+
+def main(scale=1.0, seed=42, shard_dir=None, chunk_size=500_000, temporal=False, n_jobs=None, search=None,
+         compress=None, captured=None):
+    print("="*60)
+    print("SRE AI Dashboard - Training Pipeline V2")
+    print("Now with cascade failures and extreme scenarios!")
+    print("="*60)
+    
+    if shard_dir:
+        return main_out_of_core(shard_dir, scale, seed, chunk_size, n_jobs)
+    if search:
+        return main_search(scale, seed, temporal, captured=captured, **search)
+    if compress:
+        return main_compress(scale, seed, **compress)
+    
+    print("\nGenerating training data with extreme scenarios...")
+    
+    rng = np.random.default_rng(seed)
+    X_all, y_all, feature_cols, rolling = generate_dataset(scale, rng, temporal)
+    
+    # Create DataFrame (columnar, no per-row copies)
+    df = pd.DataFrame(X_all, columns=feature_cols, copy=False)
+    df['will_have_incident'] = y_all
+    print(f"\nTotal samples: {len(df)}")
+    print(f"Incident rate: {df['will_have_incident'].mean()*100:.1f}%")
+    
+    # Save sample for inspection
+    df.head(100).to_csv("training_data_v2.csv", index=False)
+    print("Sample saved to training_data_v2.csv")
+    
+    # Check extreme values in data
+    print("\nData statistics:")
+    print(f"- Min availability: {df[[col for col in FEATURE_COLUMNS if 'availability' in col]].min().min():.1f}")
+    print(f"- Max error_rate: {df[[col for col in FEATURE_COLUMNS if 'error_rate' in col]].max().max():.1f}")
+    print(f"- Max SLO violations: {df['slo_violation_count'].max()}")
+    print(f"- Services with 0% availability: {(df[[col for col in FEATURE_COLUMNS if 'availability' in col]] == 0).sum().sum()} instances")
+    print(f"- Services with 100% error rate: {(df[[col for col in FEATURE_COLUMNS if 'error_rate' in col]] == 100).sum().sum()} instances")
+    
+    # Prepare features and labels
+    X = df[feature_cols]
+    y = df['will_have_incident']
+    
+    # Split data
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    captured_metadata = None
+    if captured:
+        X_train, y_train, captured_metadata = mix_captured_data(X_train, y_train, captured, rolling, rng)
+    
+    print(f"\nTraining set: {len(X_train)} samples")
+    print(f"Test set: {len(X_test)} samples")
+    
+    # Train XGBoost
+    print("\nTraining XGBoost model...")
+    model = xgb.XGBClassifier(**MODEL_PARAMS, n_jobs=n_jobs)
+    
+    model.fit(
+        X_train, y_train,
+        eval_set=[(X_test, y_test)],
+        verbose=False
+    )
+    
+    # Evaluate
+    y_pred = model.predict(X_test)
+    y_pred_proba = model.predict_proba(X_test)[:, 1]
+    
+    print("\n" + "="*60)
+    print("MODEL PERFORMANCE")
+    print("="*60)
+    print(f"Accuracy:  {accuracy_score(y_test, y_pred):.4f}")
+    print(f"Precision: {precision_score(y_test, y_pred):.4f}")
+    print(f"Recall:    {recall_score(y_test, y_pred):.4f}")
+    print(f"F1 Score:  {f1_score(y_test, y_pred):.4f}")
+    
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred, 
+                                target_names=['No Incident', 'Will Have Incident']))
+    
+    extreme_pred = test_extreme_scenario(model, X_test.mean(), rolling)
+    training_metadata = {
+        'mode': 'in-memory',
+        'temporal': temporal,
+        'samples': len(df),
+        'scale': scale,
+        'seed': seed,
+        'params': MODEL_PARAMS,
+        'metrics': {
+            'accuracy': accuracy_score(y_test, y_pred),
+            'precision': precision_score(y_test, y_pred),
+            'recall': recall_score(y_test, y_pred),
+            'f1': f1_score(y_test, y_pred),
+        },
+        'extreme_failure_probability': extreme_pred,
+        'captured': captured_metadata,
+    }
+    save_model(model, feature_cols, X_test.to_numpy()[:10000], training_metadata, ROLLING_CONFIG if temporal else None)
+    print_feature_importance(model, feature_cols)
+    print_training_complete()
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the SRE incident prediction model")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Multiplier on the per-scenario sample counts (default: 1.0)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for data generation")
+    parser.add_argument('--out-of-core', dest='shard_dir', metavar='DIR',
+                        help="Stream generated data to .npy shards in DIR and train from disk")
+    parser.add_argument('--chunk-size', type=int, default=500_000,
+                        help="Rows per generated shard in out-of-core mode (default: 500000)")
+    parser.add_argument('--temporal', action='store_true',
+                        help="Add rolling-window features (EWMA, rate of change, max, p95) trained on time-series scenarios")
+    parser.add_argument('--n-jobs', type=int, help="Training threads (default: all cores)")
+    parser.add_argument('--search', choices=['grid', 'random'],
+                        help="Hyperparameter search over SEARCH_GRID; saves the best model and a leaderboard")
+    parser.add_argument('--trials', type=int, default=20, help="Configurations tried by --search random (default: 20)")
+    parser.add_argument('--cores', type=int, help="Core budget for --search (default: all available)")
+    parser.add_argument('--trial-threads', type=int, default=1,
+                        help="Threads per search trial; --cores / --trial-threads trials run at once (default: 1)")
+    parser.add_argument('--early-stopping-rounds', type=int, default=30,
+                        help="Stop a search trial after this many rounds without validation improvement (default: 30)")
+    parser.add_argument('--compress', action='store_true',
+                        help="Replace the saved model with the smallest one within budget and recall tolerance")
+    parser.add_argument('--latency-budget-us', type=float, help="--compress: max p50 single-row latency (tree engine)")
+    parser.add_argument('--size-budget-kb', type=float, help="--compress: max tree bundle size in KiB")
+    parser.add_argument('--recall-tolerance', type=float, default=0.01,
+                        help="--compress: allowed recall drop vs. the saved model (default: 0.01)")
+    parser.add_argument('--f1-tolerance', type=float, default=0.02,
+                        help="--compress: allowed F1 drop vs. the saved model (default: 0.02)")
+    parser.add_argument('--distill', action='store_true',
+                        help="--compress: train candidates on the saved model's probabilities")
+    parser.add_argument('--captured', metavar='DIR',
+                        help="Mix rows captured by the server (PREDICTION_LOG_DIR) into the training set, "
+                             "labelled with the served model's decision")
+    parser.add_argument('--captured-max-rows', type=int,
+                        help="--captured: uniform sample of at most this many captured rows (default: all)")
+    parser.add_argument('--export-artifacts', action='store_true',
+                        help="Only re-export the serving artifacts and manifest from the existing model.pkl")
+    args = parser.parse_args()
+    if args.temporal and args.shard_dir:
+        parser.error("--temporal is only supported for in-memory training")
+    if args.search and args.shard_dir:
+        parser.error("--search is only supported for in-memory training")
+    if args.compress and args.shard_dir:
+        parser.error("--compress is only supported for in-memory training")
+    if args.captured and (args.shard_dir or args.compress):
+        parser.error("--captured is only supported for in-memory training and --search")
+    if args.export_artifacts:
+        main_export_artifacts()
+    else:
+        search = None
+        if args.search:
+            search = dict(strategy=args.search, num_trials=args.trials, cores=args.cores,
+                          trial_threads=args.trial_threads, early_stopping_rounds=args.early_stopping_rounds)
+        compress = None
+        if args.compress:
+            compress = dict(latency_budget_us=args.latency_budget_us, size_budget_kb=args.size_budget_kb,
+                            recall_tolerance=args.recall_tolerance, f1_tolerance=args.f1_tolerance,
+                            distill=args.distill)
+        captured = dict(log_dir=args.captured, max_rows=args.captured_max_rows) if args.captured else None
+        main(scale=args.scale, seed=args.seed, shard_dir=args.shard_dir, chunk_size=args.chunk_size,
+             temporal=args.temporal, n_jobs=args.n_jobs, search=search, compress=compress, captured=captured)
\ No newline at end of file
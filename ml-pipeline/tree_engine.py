@@ -0,0 +1,174 @@
+"""
+Tree Engine - Pure-NumPy inference for the exported XGBoost ensemble
+Flattens a binary:logistic booster into contiguous node arrays and scores
+a whole batch against all trees at once, without importing xgboost
+"""
+import json
+import numpy as np
+
+
+def flatten_booster(booster):
+    """Flatten every tree of a binary:logistic booster into contiguous node arrays"""
+    learner = json.loads(booster.save_raw(raw_format='json'))['learner']
+    objective = learner['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Unsupported objective for tree export: {objective}")
+
+    trees = learner['gradient_booster']['model']['trees']
+    num_nodes = sum(len(tree['left_children']) for tree in trees)
+    feature = np.zeros(num_nodes, dtype=np.int32)
+    threshold = np.zeros(num_nodes, dtype=np.float32)
+    left = np.zeros(num_nodes, dtype=np.int32)
+    right = np.zeros(num_nodes, dtype=np.int32)
+    default_left = np.zeros(num_nodes, dtype=bool)
+    leaf_value = np.zeros(num_nodes, dtype=np.float32)
+    roots = np.zeros(len(trees), dtype=np.int32)
+
+    offset = 0
+    max_depth = 0
+    for t, tree in enumerate(trees):
+        if any(tree['split_type']):
+            raise ValueError("Categorical splits are not supported by the tree engine")
+        tree_left = np.asarray(tree['left_children'], dtype=np.int32)
+        tree_right = np.asarray(tree['right_children'], dtype=np.int32)
+        nodes = slice(offset, offset + len(tree_left))
+        is_leaf = tree_left == -1
+
+        # Leaves point back at themselves so every row can take max_depth steps
+        local = np.arange(len(tree_left), dtype=np.int32)
+        left[nodes] = np.where(is_leaf, local, tree_left) + offset
+        right[nodes] = np.where(is_leaf, local, tree_right) + offset
+        feature[nodes] = np.where(is_leaf, 0, tree['split_indices'])
+        # For leaves xgboost stores the leaf weight in split_conditions
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        threshold[nodes] = np.where(is_leaf, 0.0, conditions)
+        leaf_value[nodes] = np.where(is_leaf, conditions, 0.0)
+        default_left[nodes] = np.asarray(tree['default_left'], dtype=bool)
+        roots[t] = offset
+        max_depth = max(max_depth, _tree_depth(tree_left, tree_right))
+        offset += len(tree_left)
+
+    # base_score is a probability ('5E-1' or '[5E-1]' depending on version)
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    return {
+        'feature': feature,
+        'threshold': threshold,
+        'left': left,
+        'right': right,
+        'default_left': default_left,
+        'leaf_value': leaf_value,
+        'roots': roots,
+        'max_depth': np.int32(max_depth),
+        'base_margin': np.float32(np.log(base_score / (1.0 - base_score))),
+        'num_features': np.int32(int(learner['learner_model_param']['num_feature'])),
+    }
+
+def _tree_depth(left, right):
+    """Depth of the deepest leaf, walking from the root"""
+    depth = 0
+    level = [0]
+    while True:
+        children = [child for node in level for child in (left[node], right[node]) if child != -1]
+        if not children:
+            return depth
+        depth += 1
+        level = children
+
+def serving_booster(model):
+    """The trees predict_proba uses: up to best_iteration when the model stopped early"""
+    booster = model.get_booster()
+    best_iteration = getattr(model, 'best_iteration', None)
+    if best_iteration is not None:
+        booster = booster[:best_iteration + 1]
+    return booster
+
+def export_trees(model, path, source_checksum=''):
+    """Export a fitted XGBClassifier to a .npz tree bundle
+
+    source_checksum records which model.pkl the bundle was flattened from,
+    so the server can detect a stale bundle.
+    """
+    arrays = flatten_booster(serving_booster(model))
+    np.savez(path, source_checksum=np.str_(source_checksum), **arrays)
+    return TreeEnsemble(arrays)
+
+def check_parity(model, engine, X, atol=1e-5):
+    """Compare the engine against model.predict_proba; returns the max absolute difference"""
+    expected = model.predict_proba(X)[:, 1]
+    actual = engine.predict_proba(X)[:, 1]
+    max_diff = float(np.max(np.abs(expected - actual))) if len(X) else 0.0
+    if max_diff > atol:
+        raise AssertionError(f"Tree engine parity check failed: max |diff| = {max_diff:.2e} > {atol:.0e}")
+    return max_diff
+
+
+class TreeEnsemble:
+    """Batch traversal of all trees at once over the flattened node arrays"""
+
+    def __init__(self, arrays):
+        self.feature = np.ascontiguousarray(arrays['feature'])
+        self.threshold = np.ascontiguousarray(arrays['threshold'])
+        self.left = np.ascontiguousarray(arrays['left'])
+        self.right = np.ascontiguousarray(arrays['right'])
+        self.default_left = np.ascontiguousarray(arrays['default_left'])
+        self.leaf_value = np.ascontiguousarray(arrays['leaf_value'])
+        self.roots = np.ascontiguousarray(arrays['roots'])
+        self.max_depth = int(arrays['max_depth'])
+        self.base_margin = np.float32(arrays['base_margin'])
+        self.num_features = int(arrays['num_features'])
+        self.source_checksum = str(arrays.get('source_checksum', ''))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as bundle:
+            return cls({key: bundle[key] for key in bundle.files})
+
+    @property
+    def num_trees(self):
+        return len(self.roots)
+
+    def predict_leaves(self, X):
+        """Leaf node index reached in every tree, shape (N, num_trees)"""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        # Gather from the flat buffer: cheaper than 2-D fancy indexing for small batches
+        flat = X.ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), self.num_trees))
+        for _ in range(self.max_depth):
+            values = flat.take(row_offsets + self.feature.take(nodes))
+            go_left = values < self.threshold.take(nodes)
+            missing = np.isnan(values)
+            if missing.any():
+                go_left = np.where(missing, self.default_left.take(nodes), go_left)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        return nodes
+
+    def predict_margin(self, X):
+        return self.leaf_value.take(self.predict_leaves(X)).sum(axis=1, dtype=np.float32) + self.base_margin
+
+    def predict_proba(self, X):
+        """Same (N, 2) layout as XGBClassifier.predict_proba"""
+        incident_prob = 1.0 / (1.0 + np.exp(-self.predict_margin(X)))
+        return np.column_stack([1.0 - incident_prob, incident_prob])
+
+
+if __name__ == '__main__':
+    # Parity and latency check of models/model_trees.npz against models/model.pkl
+    import pickle
+    import time
+    from train_model import generate_training_data
+
+    with open('../models/model.pkl', 'rb') as f:
+        model = pickle.load(f)
+    engine = TreeEnsemble.load('../models/model_trees.npz')
+
+    X, _ = generate_training_data(scale=1.0, rng=np.random.default_rng(0))
+    print(f"Max |diff| vs predict_proba on {len(X)} rows: {check_parity(model, engine, X):.2e}")
+
+    for name, scorer in (('xgboost', model), ('tree engine', engine)):
+        timings = []
+        for row in X[:500]:
+            start = time.perf_counter()
+            scorer.predict_proba(row[None, :])
+            timings.append(time.perf_counter() - start)
+        print(f"{name:12s} single-row p50: {np.percentile(timings, 50) * 1e6:.0f}us")
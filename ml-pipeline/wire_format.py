@@ -0,0 +1,42 @@
+"""
+Wire Format - Positional float32 encoding of feature vectors for /predict
+The request body is the raw little-endian float32 matrix, row-major, in the
+model's feature order. The X-Feature-Schema header carries schema_hash() of
+that order so a client built against different features is rejected instead
+of silently mis-aligned.
+"""
+import hashlib
+import numpy as np
+
+MIMETYPE = 'application/octet-stream'
+SCHEMA_HEADER = 'X-Feature-Schema'
+DTYPE = np.dtype('<f4')
+
+
+class WireFormatError(ValueError):
+    """A binary request that does not match the served model's schema"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def schema_hash(feature_names):
+    """Short stable hash of the ordered feature names"""
+    return hashlib.sha256('\n'.join(feature_names).encode()).hexdigest()[:16]
+
+def encode_matrix(X):
+    """Client side: (N, F) or (F,) array -> request body bytes"""
+    return np.ascontiguousarray(X, dtype=DTYPE).tobytes()
+
+def decode_matrix(body, feature_names, schema):
+    """Zero-copy (N, F) float32 view of a request body; validates schema and length"""
+    expected = schema_hash(feature_names)
+    if schema is None:
+        raise WireFormatError(f"Missing {SCHEMA_HEADER} header (expected {expected})")
+    if schema != expected:
+        raise WireFormatError(f"Feature schema mismatch: got {schema}, server expects {expected}", status=409)
+    row_bytes = len(feature_names) * DTYPE.itemsize
+    if not body or len(body) % row_bytes:
+        raise WireFormatError(f"Body of {len(body)} bytes is not a whole number of {row_bytes}-byte rows")
+    return np.frombuffer(body, dtype=DTYPE).reshape(-1, len(feature_names))